@@ -0,0 +1,177 @@
+"""
+Bulk creation of simple graphic entities sharing the same DXF attributes, and bulk filling of MESH and POLYFACE entities
+"""
+
+from array import array
+from itertools import chain
+
+import ezdxf
+import numpy as np
+from ezdxf.entities import factory
+from ezdxf.math import Vec3
+
+# The bulk functions write ezdxf internals : validated attributes straight in the DXFNamespace __dict__,
+# the MESH face storage and vertex buffer, the POLYFACE sub-entities. They are only checked against the bundled ezdxf,
+# with any other version the same functions go through the public API (factory methods, edit_data, append_faces)
+BULK_EZDXF_VERSION = "0.18b0"
+USE_EZDXF_INTERNALS = ezdxf.__version__ == BULK_EZDXF_VERSION
+
+if USE_EZDXF_INTERNALS:
+    from ezdxf.entities.mesh import FaceList
+    from ezdxf.lldxf.const import VTX_3D_POLYFACE_MESH_VERTEX
+else:
+    FaceList = object
+
+
+def split_faces(indices, counts):
+    "Returns the flat vertex indices of the faces as a list of vertex indices arrays, one per face"
+    return np.split(indices, np.cumsum(counts)[:-1])
+
+
+def new_entities(doc, dxftype, dxfattribs, owner, paperspace, values):
+    """Creates one entity per row of the values arrays, adds them to the entity database and returns them.
+    Only with USE_EZDXF_INTERNALS.
+    values is a dict with DXF attribute names as keys and (N,) or (N, 3) arrays as values, (N, 3) arrays are points.
+    DXF attributes are validated once on a template entity, whose attributes are then copied to every new entity
+    instead of going through the layout factory methods"""
+    template = factory.new(dxftype, dxfattribs=dxfattribs, doc=doc)
+    template.set_owner(owner, paperspace=paperspace)
+    template_attribs = template.dxf.__dict__
+    entity_class = type(template)
+    entitydb = doc.entitydb
+    names = list(values)
+    is_point = [column.ndim == 2 for column in values.values()]
+    entities = []
+    for row in zip(*(column.tolist() for column in values.values())):
+        entity = entity_class()
+        entity.doc = doc
+        # The namespace stores validated attributes in its __dict__, bypass the checks done by __setattr__
+        attribs = entity.dxf.__dict__
+        attribs.update(template_attribs)
+        attribs["_entity"] = entity
+        for name, value, point in zip(names, row, is_point):
+            attribs[name] = Vec3(value) if point else value
+        attribs["handle"] = entitydb.next_handle()
+        entitydb.add(entity)
+        entities.append(entity)
+    return entities
+
+
+def add_entities(layout, dxftype, dxfattribs, points):
+    """Adds one entity per row of the points arrays to the layout and returns them.
+    points is a dict with point attribute names as keys and (N, 3) arrays as values, e.g. {"start": ..., "end": ...}"""
+    if not USE_EZDXF_INTERNALS:
+        names = list(points)
+        return [
+            layout.new_entity(dxftype, {**dxfattribs, **dict(zip(names, row))})
+            for row in zip(*(column.tolist() for column in points.values()))
+        ]
+    entities = new_entities(
+        layout.doc, dxftype, dxfattribs, layout.block_record_handle, int(layout.is_any_paperspace), points
+    )
+    layout.entity_space.entities.extend(entities)
+    return entities
+
+
+class PackedFaceList(FaceList):
+    """MESH faces stored as the flat vertex indices of all faces and the vertex count of each face.
+    Python objects are only created when the faces are read or written as DXF tags. Only with USE_EZDXF_INTERNALS"""
+
+    def __init__(self, indices=None, counts=None):
+        self.indices = np.zeros(0, dtype=np.int64) if indices is None else indices
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+
+    @property
+    def values(self):
+        indices = self.indices.tolist()
+        ends = np.cumsum(self.counts).tolist()
+        return [array("L", indices[end - count : end]) for end, count in zip(ends, self.counts.tolist())]
+
+    @values.setter
+    def values(self, faces):
+        faces = list(faces)
+        self.counts = np.array([len(face) for face in faces], dtype=np.int64)
+        self.indices = np.fromiter(chain.from_iterable(faces), dtype=np.int64, count=int(self.counts.sum()))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def clone(self):
+        return PackedFaceList(self.indices.copy(), self.counts.copy())
+
+    def clear(self):
+        self.indices = self.indices[:0]
+        self.counts = self.counts[:0]
+
+    def tag_count(self):
+        return len(self.counts) + len(self.indices)
+
+    def export_dxf(self, tagwriter):
+        # Each face is its vertex count followed by its vertex indices
+        tags = np.empty(self.tag_count(), dtype=np.int64)
+        count_positions = np.arange(len(self.counts)) + np.concatenate(((0,), np.cumsum(self.counts)[:-1]))
+        is_count = np.zeros(len(tags), dtype=bool)
+        is_count[count_positions] = True
+        tags[is_count] = self.counts
+        tags[~is_count] = self.indices
+        tagwriter.write_tag2(93, len(tags))
+        for value in tags.tolist():
+            tagwriter.write_tag2(90, value)
+
+
+def set_mesh_data(dxf_mesh, vertices, indices, counts):
+    """Sets the vertices and faces of a MESH entity from (N, 3) vertices, the flat vertex indices of the faces
+    and the vertex count of each face. Vertices are copied once into the entity buffer, faces are kept as arrays"""
+    if not USE_EZDXF_INTERNALS:
+        with dxf_mesh.edit_data() as mesh_data:
+            mesh_data.vertices = vertices.tolist()
+            mesh_data.faces = [face.tolist() for face in split_faces(indices, counts)]
+        return
+    dxf_mesh.vertices = []
+    dxf_mesh.vertices.values.frombytes(memoryview(np.ascontiguousarray(vertices, dtype=np.float64)).cast("B"))
+    dxf_mesh._faces = PackedFaceList(indices, counts)
+
+
+def set_polyface_data(polyface, vertices, indices, counts, dxfattribs):
+    """Sets the vertices and faces of an empty POLYFACE entity from (N, 3) vertices, the flat vertex indices of the faces
+    and the vertex count of each face. Unused vertices are skipped but vertices aren't merged : the polyface keeps
+    the topology of the indices. dxfattribs are the attributes of the face records"""
+    if len(counts) and counts.max() > 4:
+        raise ValueError("POLYFACE faces have 4 vertices at most, triangulate the faces first")
+    if not USE_EZDXF_INTERNALS:
+        # ezdxf merges the vertices by location
+        polyface.append_faces([vertices[face].tolist() for face in split_faces(indices, counts)], dxfattribs=dxfattribs)
+        return
+    used, indices = np.unique(indices, return_inverse=True)
+    indices = indices.ravel()
+    starts = np.concatenate(((0,), np.cumsum(counts)[:-1]))
+    # Index of the 4 corners of each face, clamped to the last vertex of the face
+    corners = indices[starts[:, None] + np.minimum(np.arange(4), counts[:, None] - 1)]
+    doc = polyface.doc
+    owner = polyface.dxf.owner
+    paperspace = polyface.dxf.paperspace
+    layer = polyface.dxf.layer
+    mesh_vertices = new_entities(
+        doc,
+        "VERTEX",
+        {"flags": polyface.get_vertex_flags(), "layer": layer},
+        owner,
+        paperspace,
+        {"location": vertices[used]},
+    )
+    # Face records point to the mesh vertices with 1-based indices
+    face_records = new_entities(
+        doc,
+        "VERTEX",
+        {**dxfattribs, "flags": VTX_3D_POLYFACE_MESH_VERTEX, "location": (0, 0, 0), "layer": layer},
+        owner,
+        paperspace,
+        {f"vtx{i}": corners[:, i] + 1 for i in range(4)},
+    )
+    for face_record in np.array(face_records, dtype=object)[counts < 4].tolist():
+        del face_record.dxf.vtx3
+    polyface._sub_entities = mesh_vertices + face_records
+    polyface.update_count(len(mesh_vertices), len(face_records))
@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class WriterType(Enum):
+    DOCUMENT = "Document"
+    STREAM = "Streaming"
+    R12 = "R12 Fast"
+
+
+WRITER_DESCRIPTIONS = {
+    WriterType.DOCUMENT.value: "Build the whole DXF document in memory, then save it (Default)",
+    WriterType.STREAM.value: "Write entities to disk as soon as each object is exported.\nUse it to keep memory low on very large exports",
+    WriterType.R12.value: "Write a DXF R12 file with only POINT, LINE, POLYLINE, 3DFACE and POLYFACE entities, bypassing the ezdxf document.\nMuch faster with near constant memory. Blocks, texts, cameras, dimensions and grease pencils are not exported",
+}
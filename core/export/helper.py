@@ -0,0 +1,37 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def is_file_writable(path):
+    "Returns True if a file can be created next to path and the existing file (if any) isn't locked or read-only"
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, probe_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        os.remove(probe_path)
+        if os.path.exists(path):
+            # Opening in append mode doesn't touch the content but fails if the file is locked by another program
+            with open(path, "ab"):
+                pass
+    except OSError:
+        return False
+    return True
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a temporary file path in the directory of path, which replaces path when the block exits without error.
+    A crash while writing never leaves a truncated file over the previous one"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    # Temporary files are private, give the new file the permissions of the one it replaces
+    os.chmod(tmp_path, os.stat(path).st_mode if os.path.exists(path) else 0o644)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -13,22 +13,36 @@ from ezdxf_exporter.data.choice.prop import (
     NO_EXPORT,
 )
 from ezdxf_exporter.data.block.export import BlockExporter
+from ezdxf_exporter.data.block.helper import is_collection_instance
 from ezdxf_exporter.data.color.export import ColorExporter
 from ezdxf_exporter.data.dimension.export import DimensionExporter
 from ezdxf_exporter.data.grease_pencil.export import GreasePencilExporter
-from ezdxf_exporter.data.mesh.export import MeshExporter
+from ezdxf_exporter.data.mesh.export import MeshExporter, R12MeshExporter
+from ezdxf_exporter.data.mesh.helper import MeshArrays
 from ezdxf_exporter.data.transform.export import TransformExporter
 from ezdxf_exporter.data.text.export import TextExporter
 from ezdxf_exporter.data.camera.export import CameraExporter
 from ezdxf_exporter.data.curve.export import SplineExporter
 from ezdxf_exporter.data.layer.export import LayerExporter
 from ezdxf_exporter.data.unit.export import UnitExporter
+from .constants import WriterType
+from .stream import EntitySpooler, R12Spooler
+from .helper import atomic_path
 
 
 class DXFExporter:
     supported_types = {"MESH", "CURVE", "META", "SURFACE", "FONT", "EMPTY", "CAMERA", "GPENCIL"}
 
-    def __init__(self, context, settings, objects, coll_parents):
+    def __init__(
+        self,
+        context,
+        settings,
+        objects,
+        coll_parents,
+        layer_collections,
+        writer=WriterType.DOCUMENT.value,
+        binary=False,
+    ):
         self.debug_mode = False  # TODO implement debug mode
         self.log = []
         self.exported_objects = 0
@@ -38,11 +52,21 @@ class DXFExporter:
 
         self.msp = self.doc.modelspace()  # Access to dxf Modelspace
 
+        # Binary DXF is written straight to the output stream, ASCII otherwise
+        self.fmt = "bin" if binary else "asc"
+        # In streaming mode, modelspace entities are written to disk after each object
+        self.entity_spooler = EntitySpooler(self.doc, self.fmt) if writer == WriterType.STREAM.value else None
+        # In R12 fast mode, geometry is written by the R12 stream writer. The document is only used to resolve layers
+        self.r12_spooler = R12Spooler(self.fmt) if writer == WriterType.R12.value else None
+        # Layout receiving the modelspace geometry
+        self.layout = self.msp if self.r12_spooler is None else self.r12_spooler.writer
+
         self.context = context
         self.settings = settings
+        self.layer_collections = layer_collections
 
         self.block_exporter = BlockExporter(self)
-        self.mesh_exporter = MeshExporter(self)
+        self.mesh_exporter = MeshExporter(self) if self.r12_spooler is None else R12MeshExporter(self)
         self.color_exporter = ColorExporter(self)
         self.layer_exporter = LayerExporter(self)
         self.dimension_exporter = DimensionExporter(self)
@@ -53,13 +77,18 @@ class DXFExporter:
         self.grease_pencil_exporter = GreasePencilExporter(self)
         self.unit_exporter = UnitExporter(self)
         self.update_supported_types()
-        self.objects = [o for o in objects if o.type in self.supported_types]
+        # The R12 fast writer has no BLOCKs
+        self.use_instances = settings.choice.use_instances and self.r12_spooler is None
+        self.objects = [
+            o for o in objects if o.type in self.supported_types or self.use_instances and is_collection_instance(o)
+        ]
 
         self.objects_text = []
         self.objects_empty_blocks = []
         self.objects_camera = []
         self.objects_curve = []
         self.objects_grease_pencil = []
+        self.objects_collection_instances = []
 
         self.coll_parents = coll_parents
 
@@ -76,17 +105,34 @@ class DXFExporter:
                 self.supported_types.discard(_type)
             else:
                 self.supported_types.add(_type)
+        if self.r12_spooler is not None:
+            self.supported_types.discard("GPENCIL")
 
     def write_file(self, path):
         "Saves the File and returns True if successful, False if Error"
         try:
-            self.doc.saveas(path)
+            with atomic_path(path) as tmp_path:
+                if self.r12_spooler is not None:
+                    self.r12_spooler.save(tmp_path, self.doc.layers)
+                elif self.entity_spooler is not None:
+                    self.entity_spooler.save(tmp_path)
+                else:
+                    self.doc.saveas(tmp_path, fmt=self.fmt)
             return True
         except (PermissionError, FileNotFoundError):
             return False
 
+    def flush_entities(self):
+        "Streaming mode : Write the modelspace entities created so far to disk and release them"
+        if self.entity_spooler is not None:
+            self.entity_spooler.flush(self.msp)
+
     def filter_objects(self):
         "Pops objects from the objects container and populate respective pools if they aren't exported as Mesh"
+        if self.use_instances:
+            for i in range(len(self.objects) - 1, -1, -1):
+                if is_collection_instance(self.objects[i]):
+                    self.objects_collection_instances.append(self.objects.pop(i))
         for attr, value, _type, container in (
             ("texts_export", TextType.MESH.value, "FONT", self.objects_text),
             ("empties_export", EmptyType.POINT.value, "EMPTY", self.objects_empty_blocks),
@@ -99,6 +145,14 @@ class DXFExporter:
                     container.append(self.objects.pop(i))
 
     def write_objects(self):
+        if self.r12_spooler is not None:
+            # The R12 fast writer only supports plain geometry : no blocks, texts, cameras or splines
+            skipped = self.objects_text + self.objects_empty_blocks + self.objects_camera + self.objects_curve
+            if skipped:
+                self.log.append(f"R12 Fast : {len(skipped)} objects of unsupported types were not exported")
+            [self.write_mesh_object(obj) for obj in self.objects]
+            return
+
         self.export_curves()
         self.export_texts()
         self.export_empty_blocks()
@@ -108,46 +162,46 @@ class DXFExporter:
         else:
             # Export objects as MESH and/or LINES and/or POINTS
             [self.write_mesh_object(obj) for obj in self.objects]
+        self.export_instances()
         self.export_cameras()
 
         if self.debug_mode:
             self.log.append(f"Exported {self.exported_objects} Objects")
 
-    def get_dxf_attribs(self, obj, entity_type=None) -> Dict[str, any]:
+    def get_dxf_attribs(self, obj, entity_type=None, check_excluded=True) -> Dict[str, any]:
         """Populate dxfattribs used by most Drawing entity factor methods
         1. Adds color keys and values
-        2. Adds the layer name
+        2. Adds the layer name, ignoring exclusion from the view layer if not check_excluded
         """
         dxfattribs = {}
-        for mgr in (self.color_exporter, self.layer_exporter):
-            if not mgr.populate_dxfattribs(obj, dxfattribs, entity_type=entity_type):
-                return False
+        self.color_exporter.populate_dxfattribs(obj, dxfattribs, entity_type=entity_type)
+        if not self.layer_exporter.populate_dxfattribs(
+            obj, dxfattribs, entity_type=entity_type, check_excluded=check_excluded
+        ):
+            return False
         return dxfattribs
 
-    def on_entity_created(self, base_obj, entity, dxfattribs, is_block=False):
-        "Callback called when a new entity is created"
-        if entity:
-            if not is_block:
-                dx, dy, dz = self.settings.transform.delta_xyz
-                entity.translate(dx, dy, dz)
-            if dxfattribs.get("transparency"):
-                entity.transparency = dxfattribs.get("transparency") / 10
-
     def export_curves(self):
-        "Export CURVE Objects as Spline Entities"
+        "Export CURVE Objects as Spline or Polyline Entities"
         for curve in self.objects_curve:
             dxfattribs = self.get_dxf_attribs(curve, CurveType)
             if not dxfattribs:
                 continue
-            self.spline_exporter.write_curve(
-                self.msp,
-                curve,
-                self.transform_exporter.get_matrix(curve),
-                # TODO : like texts, derive raa from matrix_world
-                self.transform_exporter.get_rotation_axis_angle(curve),
-                dxfattribs,
-                callback=lambda e: self.on_entity_created(curve, e, dxfattribs),
-            )
+            if self.settings.choice.curves_export == CurveType.POLYLINE.value:
+                self.spline_exporter.write_curve_polylines(
+                    self.msp,
+                    curve,
+                    self.transform_exporter.get_matrix(curve),
+                    dxfattribs,
+                )
+            else:
+                self.spline_exporter.write_curve(
+                    self.msp,
+                    curve,
+                    self.transform_exporter.get_matrix(curve),
+                    dxfattribs,
+                )
+            self.flush_entities()
 
     def export_texts(self):
         "Export FONT Objects as MTEXT or TEXT entities"
@@ -160,8 +214,8 @@ class DXFExporter:
                 text,
                 self.transform_exporter.get_matrix(text),
                 dxfattribs,
-                callback=lambda e: self.on_entity_created(text, e, dxfattribs),
             )
+            self.flush_entities()
 
     def export_empty_blocks(self):
         "Export EMPTY objects as BLOCK with 1 point entity (Else you can't select it)"
@@ -169,8 +223,7 @@ class DXFExporter:
             empty_block = self.block_exporter.initialize_block("Empty")
             self.mesh_exporter.create_mesh_point(empty_block, (0, 0, 0))
             # TODO : Add custom properties as Block attributes
-            for empty in self.objects_empty_blocks:
-                self.write_block(empty_block, empty, EmptyType)
+            self.write_blocks(empty_block, self.objects_empty_blocks, EmptyType)
 
     def export_linked_objects(self):
         "Export Linked Objects as multiple BLOCKs"
@@ -181,7 +234,14 @@ class DXFExporter:
             self.write_mesh_object(obj=obj, layout=block, is_block=True)
         for block, objs in blocks_dic.values():
             # Instantiate all linked objects from block definition
-            [self.write_block(block, obj) for obj in objs]
+            self.write_blocks(block, objs)
+
+    def export_instances(self):
+        "Export collection instances and instances generated by objects as BLOCKs and INSERTs"
+        if not self.use_instances:
+            return
+        self.block_exporter.export_collection_instances(self.objects_collection_instances)
+        self.block_exporter.export_object_instances(self.objects + self.objects_curve + self.objects_text)
 
     def export_cameras(self):
         for camera in self.objects_camera:
@@ -191,78 +251,110 @@ class DXFExporter:
                 self.settings.transform.delta_xyz,
             )
 
-    def write_mesh_object(self, obj, layout=None, is_block=False):
+    def write_mesh_object(self, obj, layout=None, is_block=False, matrix=None, mesh=None, check_excluded=True):
+        """Writes the object geometry. matrix overrides the object export matrix.
+        mesh is an already evaluated mesh to write instead of the object's own, it isn't freed here.
+        If not check_excluded, layers ignore the exclusion of the object from the view layer (content of instanced collections)"""
         if layout is None:
-            layout = self.msp
+            layout = self.layout
         dxfattribs = {}
         settings = self.settings
         data_settings = settings.choice
         depsgraph = self.context.evaluated_depsgraph_get()
 
         if obj.type == "EMPTY":
-            dxfattribs = self.get_dxf_attribs(obj, EmptyType)
+            dxfattribs = self.get_dxf_attribs(obj, EmptyType, check_excluded)
             if not dxfattribs:
                 return
             self.mesh_exporter.create_mesh_point(
-                self.msp, obj.location, dxfattribs, callback=lambda e: self.on_entity_created(obj, e, dxfattribs)
+                self.layout, Vec3(obj.location) + Vec3(self.settings.transform.delta_xyz), dxfattribs
             )
         else:
-            evaluated_object = obj.evaluated_get(depsgraph)
-
-            # Since Mesh Objects can be exported as Faces, Edges and Vertices
-            # We loop through all three of these options
-            i = -1
-            for mesh_type, mesh_setting in (
-                (PointType, data_settings.points_export),
-                (LineType, data_settings.lines_export),
-                (FaceType, data_settings.faces_export),
-            ):
-                i += 1
-                if obj.type == "GPENCIL":
-                    if mesh_type in (FaceType, PointType):
-                        continue
-                    mesh_method = lambda layout, evaluated_obj, dxfattribs, callback: self.grease_pencil_exporter.write_gpencil_object(
-                        layout, evaluated_obj, dxfattribs, callback, self.transform_exporter.get_matrix(obj, is_block)
+            if obj.type == "GPENCIL":
+                # Strokes are exported as lines whatever the mesh settings, gpencil_export already filtered the object
+                passes = [(LineType, data_settings.lines_export)]
+            else:
+                passes = [
+                    (mesh_type, mesh_setting)
+                    for mesh_type, mesh_setting in (
+                        (PointType, data_settings.points_export),
+                        (LineType, data_settings.lines_export),
+                        (FaceType, data_settings.faces_export),
                     )
-                    evaluated_mesh = evaluated_object
-                else:
-                    evaluated_mesh = self.mesh_exporter.get_evaluated_mesh(obj, self.context)
-                    evaluated_mesh.transform(self.transform_exporter.get_matrix(obj, is_block))
-                    mesh_method = self.mesh_exporter.get_mesh_method(mesh_setting, evaluated_mesh)
-                if mesh_method is None:
-                    continue
-                self.color_exporter.populate_dxfattribs(obj, dxfattribs, mesh_type)
-                if not self.layer_exporter.populate_dxfattribs(obj, dxfattribs, entity_type=mesh_type, override=True):
-                    continue
-                if i == 2:
-                    # Triangulate to prevent N-Gons. Do it last to preserve geometry for lines
-                    self.mesh_exporter.triangulate_if_needed(evaluated_mesh, obj.type)
-                mesh_method(
-                    layout,
-                    evaluated_mesh,
-                    dxfattribs.copy(),
-                    callback=lambda e: self.on_entity_created(obj, e, dxfattribs, is_block=is_block),
-                )
+                    if mesh_setting != NO_EXPORT
+                ]
+            if not passes:
+                return
+            if matrix is None:
+                matrix = self.transform_exporter.get_matrix(obj, is_block)
+            if obj.type == "GPENCIL":
+                mesh_data = obj.evaluated_get(depsgraph)
+            else:
+                # Evaluate the mesh once, it is shared by the points, lines and faces passes
+                evaluated_mesh = self.mesh_exporter.get_evaluated_mesh(obj, depsgraph) if mesh is None else mesh
+                # Geometry is read in bulk into numpy arrays and transformed in a single operation
+                mesh_data = MeshArrays(evaluated_mesh)
+                mesh_data.transform(matrix)
+
+            try:
+                # Since Mesh Objects can be exported as Faces, Edges and Vertices
+                # We loop through all three of these options
+                for mesh_type, mesh_setting in passes:
+                    if obj.type == "GPENCIL":
+                        mesh_method = lambda layout, evaluated_obj, dxfattribs: self.grease_pencil_exporter.write_gpencil_object(
+                            layout, evaluated_obj, dxfattribs, matrix
+                        )
+                    else:
+                        mesh_method = self.mesh_exporter.get_mesh_method(mesh_setting, mesh_data)
+                    if mesh_method is None:
+                        continue
+                    self.color_exporter.populate_dxfattribs(obj, dxfattribs, mesh_type)
+                    if not self.layer_exporter.populate_dxfattribs(
+                        obj, dxfattribs, entity_type=mesh_type, override=True, check_excluded=check_excluded
+                    ):
+                        continue
+                    if mesh_type is FaceType:
+                        # Triangulate to prevent N-Gons. Do it last to preserve geometry for lines
+                        # A given mesh is the geometry of an instance, the type of obj (its instancer) doesn't apply
+                        self.mesh_exporter.triangulate_if_needed(mesh_data, obj.type if mesh is None else "MESH")
+                    mesh_method(layout, mesh_data, dxfattribs.copy())
+            finally:
+                if obj.type != "GPENCIL" and mesh is None:
+                    # Free the evaluated mesh right away so memory doesn't grow with the number of objects
+                    self.mesh_exporter.clear_evaluated_mesh(obj, depsgraph)
+        self.flush_entities()
         if self.debug_mode:
             self.log.append(f"{obj.name} WAS exported.")
             self.exported_objects += 1
 
-    def write_block(self, block, obj, entity_type=None):
-        dxfattribs = self.get_dxf_attribs(obj, entity_type)
-        if not dxfattribs:
-            return
-        self.block_exporter.instantiate_block(
-            block,
-            self.transform_exporter.get_matrix(obj),
-            self.transform_exporter.get_rotation_axis_angle(obj),
-            dxfattribs,
-            callback=lambda e: self.on_entity_created(obj, e, dxfattribs),
-        )
-
-        if self.debug_mode:
-            self.log.append(f"{obj.name} was added as a Block")
+    def write_blocks(self, block, objs, entity_type=None):
+        """Instantiate the block once per object. INSERT transforms are derived from the objects matrices in one batch.
+        Objects with a sheared matrix (e.g. children of a rotated parent with a non uniform scale) can't be INSERTs,
+        they are written as regular geometry"""
+        all_matrices = [self.transform_exporter.get_matrix(obj) for obj in objs]
+        matrices = []
+        dxfattribs_list = []
+        names = []
+        for obj, matrix, is_sheared in zip(objs, all_matrices, self.block_exporter.get_sheared(all_matrices)):
+            if is_sheared:
+                self.log.append(f"{obj.name} was not added as a Block : its transform is sheared")
+                self.write_mesh_object(obj)
+                continue
+            dxfattribs = self.get_dxf_attribs(obj, entity_type)
+            if not dxfattribs:
+                continue
+            matrices.append(matrix)
+            dxfattribs_list.append(dxfattribs)
+            names.append(obj.name)
+            if self.debug_mode:
+                self.log.append(f"{obj.name} was added as a Block")
+        self.block_exporter.insert_blocks(self.msp, block, matrices, dxfattribs_list, names)
+        self.flush_entities()
 
     def write_dimensions(self, strokes):
+        if self.r12_spooler is not None:
+            self.log.append("R12 Fast : Dimensions are not exported")
+            return
         # TODO : Add dimensions if annotation layer is hidden in blend file
         for s in strokes:
             # TODO : Angle dimensions
@@ -282,5 +374,19 @@ class DXFExporter:
                 self.layer_exporter.get_or_create_layer_from_mat(mat)
 
     def export_file(self, path):
+        if self.r12_spooler is not None:
+            try:
+                return self.write_file(path)
+            finally:
+                self.r12_spooler.close()
+        if self.entity_spooler is not None:
+            self.flush_entities()
+            # Spooled entities are copied in the ENTITIES section while the document is written
+            self.msp.entity_space.entities.append(self.entity_spooler)
         self.doc.entitydb.purge()
-        return self.write_file(path)
+        try:
+            return self.write_file(path)
+        finally:
+            if self.entity_spooler is not None:
+                self.msp.entity_space.entities.remove(self.entity_spooler)
+                self.entity_spooler.close()
@@ -5,9 +5,12 @@ from bpy_extras.io_utils import ExportHelper
 from bpy.props import (
     StringProperty,
     BoolProperty,
+    EnumProperty,
 )
 from .main import DXFExporter
-from ezdxf_exporter.core.shared_maths import parent_lookup
+from .helper import is_file_writable
+from .constants import WriterType, WRITER_DESCRIPTIONS
+from ezdxf_exporter.core.shared_maths import parent_lookup, layer_collection_lookup
 from ezdxf_exporter.data.layer.constants import EntityLayer
 from ezdxf_exporter.data.layer.prop import PreferencesSettings
 from ezdxf_exporter.core.settings.prop import Settings
@@ -32,6 +35,19 @@ class DXFEXPORTER_OT_Export(bpy.types.Operator, ExportHelper):
         name="File Name", description="filepath", default="", maxlen=1024, options={"ANIMATABLE"}, subtype="NONE"
     )
 
+    writer: EnumProperty(
+        name="Writer",
+        description="How the DXF file is written",
+        default=WriterType.DOCUMENT.value,
+        items=[(w_t.value, w_t.value, WRITER_DESCRIPTIONS.get(w_t.value, "")) for w_t in WriterType],
+    )
+
+    binary: BoolProperty(
+        name="Binary DXF",
+        description="Write a Binary DXF file.\nSmaller and faster to load in CAD software",
+        default=False,
+    )
+
     verbose: BoolProperty(
         name="Debug", default=False, description="Run the exporter in debug mode.\nCheck the console for output"
     )
@@ -50,22 +66,27 @@ class DXFEXPORTER_OT_Export(bpy.types.Operator, ExportHelper):
 
     def execute(self, context):
         start_time = time()
+        if not is_file_writable(self.filepath):
+            self.report(
+                {"ERROR"},
+                f"Permission Error : File {self.filepath} can't be modified (Close the file in your CAD software and check if you have write permission)",
+            )
+            return {"FINISHED"}
+
+        # Index of the view layer collections, shared by the objects filter and the layers assignment
+        layer_collections = layer_collection_lookup(context.view_layer.layer_collection)
         exporter = DXFExporter(
             context=context,
             settings=self.settings,
-            objects=self.settings.get_objects(context),
+            objects=self.settings.get_objects(context, layer_collections),
             coll_parents=parent_lookup(context.scene.collection)
             if self.settings.default_layer.entity_layer_to == EntityLayer.COLLECTION.value
             and self.settings.default_layer.entity_layer_color != "2"
             else None,
+            layer_collections=layer_collections,
+            writer=self.writer,
+            binary=self.binary,
         )
-        if not exporter.write_file(self.filepath):
-            self.report(
-                {"ERROR"},
-                f"Permission Error : File {self.filepath} can't be modified (Close the file in your CAD software and check if you have write permission)",
-            )
-            return {"FINISHED"}
-
         exporter.export_materials_as_layers()
         exporter.filter_objects()
         exporter.write_objects()
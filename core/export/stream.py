@@ -0,0 +1,130 @@
+"""
+Streaming backends : Entities are written to a temporary spool file as soon as an object is exported.
+EntitySpooler releases modelspace entities from the document and copies them in the ENTITIES section when
+the document is saved, so the header, tables and blocks (which may still change until the end of the export) are written last.
+R12Spooler bypasses the document and writes R12 entities with the R12 fast stream writer, only the layers of the
+document are written in its tables
+"""
+
+import tempfile
+from ezdxf.entities import Layer
+from ezdxf.lldxf.tagwriter import TagWriter, BinaryTagWriter
+from ezdxf.addons.r12writer import R12FastStreamWriter, BinaryDXFWriter, PREFACE
+from ezdxf_exporter.data.color.helper import get_nearest_aci
+
+CHUNK_SIZE = 1 << 20
+
+
+class EntitySpooler:
+    "Spools modelspace entities to disk so the document never holds more than the entities of one object"
+
+    def __init__(self, doc, fmt="asc"):
+        self.doc = doc
+        self.fmt = fmt
+        # Binary file the document is written to, see save
+        self.output = None
+        if fmt == "bin":
+            self.spool = tempfile.TemporaryFile(mode="w+b")
+            self.tagwriter = BinaryTagWriter(self.spool, dxfversion=doc.dxfversion, encoding=doc.output_encoding)
+        else:
+            self.spool = tempfile.TemporaryFile(mode="w+t", encoding="utf-8", newline="")
+            self.tagwriter = TagWriter(self.spool, dxfversion=doc.dxfversion)
+
+    @property
+    def is_alive(self):
+        "Required by ezdxf to export the spooler like a regular entity"
+        return True
+
+    def flush(self, layout):
+        "Writes the entities of the layout to the spool file and deletes them from the document"
+        entitydb = self.doc.entitydb
+        entity_space = layout.entity_space
+        for entity in entity_space:
+            entity.export_dxf(self.tagwriter)
+            entitydb.discard(entity)
+            entity.destroy()
+        entity_space.clear()
+
+    def export_dxf(self, tagwriter):
+        "Copies the spooled entities with the tagwriter of the document"
+        self.spool.seek(0)
+        if self.fmt == "bin":
+            # Binary tags are already encoded, they are copied as is in the output file
+            for chunk in iter(lambda: self.spool.read(CHUNK_SIZE), b""):
+                self.output.write(chunk)
+        else:
+            for chunk in iter(lambda: self.spool.read(CHUNK_SIZE), ""):
+                tagwriter.write_str(chunk)
+
+    def save(self, path):
+        "Saves the document to path. Binary files are opened here so spooled tags can be copied in the same file"
+        if self.fmt == "bin":
+            with open(path, "wb") as stream:
+                self.output = stream
+                try:
+                    self.doc.write(stream, fmt="bin")
+                finally:
+                    self.output = None
+        else:
+            self.doc.saveas(path)
+
+    def close(self):
+        self.spool.close()
+
+
+def get_r12_layer_table(layers):
+    "Returns the R12 LAYER table of the document layers as a DXF string. True colors become the nearest ACI color"
+    entries = []
+    for layer in layers:
+        rgb = layer.rgb
+        color = layer.color if rgb is None else get_nearest_aci(rgb)
+        # A negative color turns the layer off
+        if layer.is_off():
+            color = -color
+        flags = Layer.FROZEN if layer.is_frozen() else 0
+        linetype = layer.dxf.get("linetype", "CONTINUOUS")
+        entries.append(f"  0\nLAYER\n  2\n{layer.dxf.name}\n 70\n{flags}\n 62\n{color}\n  6\n{linetype}\n")
+    return f"  0\nTABLE\n  2\nLAYER\n 70\n{len(entries)}\n" + "".join(entries) + "  0\nENDTAB\n"
+
+
+class R12Spooler:
+    """Spools the ENTITIES section of a DXF R12 file written by the R12 fast stream writer.
+    The header and tables are written in front of it when the file is saved, once all layers are known"""
+
+    def __init__(self, fmt="asc"):
+        self.fmt = fmt
+        if fmt == "bin":
+            # Tags are encoded on the fly, entity by entity
+            self.spool = tempfile.TemporaryFile(mode="w+b")
+            binary_writer = BinaryDXFWriter(self.spool)
+            # The binary signature is written again in front of the tables
+            self.entities_start = self.spool.tell()
+            self.writer = R12FastStreamWriter(binary_writer)
+        else:
+            self.spool = tempfile.TemporaryFile(mode="w+t", encoding="utf-8", newline="")
+            self.entities_start = 0
+            self.writer = R12FastStreamWriter(self.spool)
+
+    def get_preface(self, layers):
+        "Returns the header and tables of the fast stream writer with the LAYER table of the document layers"
+        tables_end = PREFACE.rindex("  0\nENDSEC\n")
+        return PREFACE[:tables_end] + get_r12_layer_table(layers) + PREFACE[tables_end:]
+
+    def save(self, path, layers):
+        "Closes the R12 stream and copies it to path, after the header and the tables with the given layers"
+        self.writer.close()
+        preface = self.get_preface(layers)
+        self.spool.seek(self.entities_start)
+        if self.fmt == "bin":
+            with open(path, "wb") as stream:
+                BinaryDXFWriter(stream).write(preface)
+                for chunk in iter(lambda: self.spool.read(CHUNK_SIZE), b""):
+                    stream.write(chunk)
+        else:
+            with open(path, "wt", encoding="cp1252", errors="dxfreplace") as stream:
+                stream.write(preface)
+                for chunk in iter(lambda: self.spool.read(CHUNK_SIZE), ""):
+                    stream.write(chunk)
+
+    def close(self):
+        self.spool.close()
@@ -14,6 +14,8 @@ def draw_op(self, context):
     layout = self.layout
     draw_preset(self, context)
     self.settings.draw(layout, context)
+    layout.prop(self, "writer")
+    layout.prop(self, "binary")
     layout.prop(self, "verbose")
 
 
@@ -12,9 +12,13 @@ from ezdxf_exporter.data.layer.prop import GlobalLayerSettings
 from ezdxf_exporter.data.transform.prop import TransformSettings
 from ezdxf_exporter.data.filter.prop import FilterSettings, ExportObjects, ExcludedObject
 from ezdxf_exporter.data.text.prop import TextSettings
+from ezdxf_exporter.data.grease_pencil.prop import GreasePencilSettings
+from ezdxf_exporter.data.curve.prop import CurveSettings
+from ezdxf_exporter.data.mesh.prop import MeshSettings
 from ezdxf_exporter.data.unit.prop import PreferencesSettings as UnitSettings
 
 from ezdxf_exporter.core.preferences.helper import get_preferences
+from ezdxf_exporter.core.shared_maths import layer_collection_lookup
 
 from .ui import draw
 
@@ -51,9 +55,13 @@ class Settings(bpy.types.PropertyGroup):
     # Note : The 1st element is the default settings if no entity overrides it
     entities: CollectionProperty(type=EntityProperties)
     text: PointerProperty(type=TextSettings)
+    grease_pencil: PointerProperty(type=GreasePencilSettings)
+    curve: PointerProperty(type=CurveSettings)
+    mesh: PointerProperty(type=MeshSettings)
     unit: PointerProperty(type=UnitSettings)
 
-    def get_objects(self, context):
+    def get_objects(self, context, layer_collections=None):
+        "Returns the objects to export. layer_collections is the index built by layer_collection_lookup, built here if not given"
         export_setting = self.filter.export_objects
         exclude_setting = self.filter.export_excluded
         if export_setting == ExportObjects.SELECTED.value:
@@ -62,10 +70,12 @@ class Settings(bpy.types.PropertyGroup):
             return context.visible_objects
         elif export_setting == ExportObjects.SCENE.value:
             if exclude_setting == ExcludedObject.NONE:
+                if layer_collections is None:
+                    layer_collections = layer_collection_lookup(context.view_layer.layer_collection)
                 return [
                     o
                     for o in context.scene.objects
-                    if not context.view_layer.layer_collection.children[o.users_collection[0].name].exclude
+                    if not layer_collections.get(o.users_collection[0].name, (None, False))[1]
                     and not o.hide_viewport
                     and not o.hide_get()
                 ]
@@ -1,5 +1,6 @@
 import math
 import struct
+import numpy as np
 
 
 def rotate(origin, point, angle):
@@ -16,6 +17,13 @@ def rotate(origin, point, angle):
     return qx, qy, 0
 
 
+def get_co_array(collection, size=3, attr="co"):
+    "Returns a vector attribute ('co' by default) of every element of a bpy collection as a (N, size) float array"
+    co = np.empty(len(collection) * size, dtype=np.float32)
+    collection.foreach_get(attr, co)
+    return co.reshape(-1, size).astype(np.float64)
+
+
 def float_to_hex(f):
     return hex(struct.unpack("<I", struct.pack("<f", f))[0])
 
@@ -32,3 +40,16 @@ def parent_lookup(coll):
         for c in coll.children:
             parent_lookup.setdefault(c, coll)
     return parent_lookup
+
+
+def layer_collection_lookup(layer_coll):
+    """Returns a dict with collection names as keys and (layer collection, is excluded) tuples as values.
+    A layer collection is excluded if it or any of its parents is excluded from the view layer"""
+    lookup = {}
+    stack = [(layer_coll, False)]
+    while stack:
+        layer_coll, parent_excluded = stack.pop()
+        excluded = parent_excluded or layer_coll.exclude
+        lookup[layer_coll.name] = (layer_coll, excluded)
+        stack.extend((child, excluded) for child in layer_coll.children)
+    return lookup
@@ -4,13 +4,23 @@ Takes care of regular BLOCKs logic
 
 from collections import defaultdict
 
-from ezdxf.math import UCS
+import numpy as np
+from mathutils import Matrix
 from ezdxf_exporter.core.export.prop import DataExporter
+from ezdxf_exporter.data.mesh.helper import MeshArrays
+from .helper import get_geometry_hash, get_insert_params, get_sheared, is_collection_instance
 
 
 class BlockExporter(DataExporter):
     "Manager for block creation and instantation"
 
+    # Object types written in instance blocks. Their geometry is exported as meshes
+    instance_types = {"MESH", "CURVE", "META", "SURFACE", "FONT"}
+
+    def __init__(self, exporter) -> None:
+        super().__init__(exporter)
+        self._collection_blocks = {}
+
     def get_data_users(self) -> dict:
         "Returns a dict with data as key and object users as values"
         data_obj_dict = defaultdict(list)
@@ -18,53 +28,211 @@ class BlockExporter(DataExporter):
             data_obj_dict[obj.data].append(obj)
         return data_obj_dict
 
+    def get_geometry_users(self, objs) -> dict:
+        """Returns a dict with a geometry hash as key and objects with identical evaluated geometry as values.
+        Geometry is compared in object space. Objects that can't be evaluated to a mesh are stored under the None key"""
+        exp = self.exporter
+        depsgraph = exp.context.evaluated_depsgraph_get()
+        geometry_obj_dict = defaultdict(list)
+        for obj in objs:
+            if obj.type in ("EMPTY", "GPENCIL"):
+                geometry_obj_dict[None].append(obj)
+                continue
+            mesh = exp.mesh_exporter.get_evaluated_mesh(obj, depsgraph)
+            try:
+                if mesh is None or not mesh.vertices:
+                    geometry_obj_dict[None].append(obj)
+                    continue
+                geometry_hash = get_geometry_hash(MeshArrays(mesh))
+            finally:
+                exp.mesh_exporter.clear_evaluated_mesh(obj, depsgraph)
+            # Colors and layers may come from materials, objects with different materials can't share a block
+            materials = tuple(slot.material for slot in obj.material_slots)
+            geometry_obj_dict[(geometry_hash, materials)].append(obj)
+        return geometry_obj_dict
+
+    def get_unique_block_name(self, name):
+        "Returns the name with a numbered suffix if a BLOCK with that name already exists"
+        blocks = self.exporter.doc.blocks
+        unique_name = name
+        i = 0
+        while unique_name in blocks:
+            i += 1
+            unique_name = f"{name}.{i:03d}"
+        return unique_name
+
     def initialize_block(self, name):
         "Creates and return a new blank BLOCK entity"
-        return self.exporter.doc.blocks.new(name=name)
+        return self.exporter.doc.blocks.new(name=self.get_unique_block_name(name))
 
     def initialize_blocks(self):
         """Initialize objects that share the same data as Blocks.
         Returns :
         Arg 1 : Dictionary with one of the objects as a key, and a tuple (n=2) containing the block (i=0) and a list will all linked objects (i=1) as a value
-        Arg 2 : List containing single-user data objects (not to be instantiated as blocks)"""
+        Arg 2 : List containing single-user data objects and objects with modifiers (not to be instantiated as blocks)"""
         blocks_dict = {}
-        not_blocks = []
+        # Objects that are not instantiated as blocks, with the reason why
+        not_blocks = {}
         for data, objs in self.get_data_users().items():
-            if not objs:
-                continue
-            obj = objs[0]
-            for i in range(len(objs)):
-                # Do not export linked objects as blocks if they have a modifier because 
+            blockable = []
+            for obj in objs:
+                # Do not export linked objects as blocks if they have a modifier because
                 # The evaluated mesh may or may not be different for every linked object
                 if obj.modifiers:
-                    not_blocks.append(objs.pop(0))
-            if len(objs) == 1:
-                not_blocks.append(obj)
+                    not_blocks[obj] = "it has modifiers"
+                else:
+                    blockable.append(obj)
+            if not blockable:
+                continue
+            obj = blockable[0]
+            if len(blockable) == 1:
+                if len(objs) == 1:
+                    not_blocks[obj] = "its data is not used by another exported object"
+                else:
+                    not_blocks[obj] = "the other users of its data have modifiers"
             elif data is None:
-                # Linked Empties. TODO : create blocks with linked empties. 
+                # Linked Empties. TODO : create blocks with linked empties.
                 # For now they are instantiated as regular objects
                 # not_blocks.extend(objs)
-                blocks_dict[obj] = (self.initialize_block("__Empty__"), objs)
+                blocks_dict[obj] = (self.initialize_block("__Empty__"), blockable)
             else:
-                blocks_dict[obj] = (self.initialize_block(data.name), objs)
-        return blocks_dict, not_blocks
+                blocks_dict[obj] = (self.initialize_block(data.name), blockable)
+        if self.exporter.settings.choice.use_geometry_blocks:
+            not_blocks = self.initialize_geometry_blocks(blocks_dict, not_blocks)
+        log = self.exporter.log
+        for obj, reason in not_blocks.items():
+            log.append(f"{obj.name} was not added as a Block : {reason}")
+        return blocks_dict, list(not_blocks)
+
+    def initialize_geometry_blocks(self, blocks_dict, not_blocks):
+        """Initialize objects with identical evaluated geometry as Blocks, even if they don't share data or have modifiers.
+        not_blocks is a dict with objects as keys and the reason they aren't blocks as values.
+        Updates blocks_dict and returns the objects that are still not blocks, with the reason why"""
+        still_not_blocks = {}
+        for key, geometry_objs in self.get_geometry_users(not_blocks).items():
+            if key is None:
+                still_not_blocks.update((obj, not_blocks[obj]) for obj in geometry_objs)
+            elif len(geometry_objs) == 1:
+                obj = geometry_objs[0]
+                still_not_blocks[obj] = f"{not_blocks[obj]} and no other object has the same geometry"
+            else:
+                obj = geometry_objs[0]
+                blocks_dict[obj] = (self.initialize_block(obj.data.name), geometry_objs)
+        return still_not_blocks
+
+    def get_sheared(self, matrices):
+        "Returns a list of bools, True for the 4x4 matrices that have shear and can't place an INSERT"
+        if not matrices:
+            return []
+        return get_sheared(np.array(matrices, dtype=np.float64).reshape(-1, 4, 4)).tolist()
 
-    def instantiate_block(self, block, matrix, raa, dxfattribs, callback=None):
+    def insert_blocks(self, layout, block, matrices, dxfattribs_list, names=None):
+        """Adds an INSERT of the block to the layout for each 4x4 matrix. Transforms are computed in one batch.
+        names are the objects placing each INSERT, those with a sheared matrix are logged as approximated"""
+        if not matrices:
+            return []
+        matrices = np.array(matrices, dtype=np.float64).reshape(-1, 4, 4)
+        sheared = get_sheared(matrices)
+        if sheared.any():
+            log = self.exporter.log
+            for name, is_sheared in zip(names or [block.name] * len(matrices), sheared.tolist()):
+                if is_sheared:
+                    log.append(f"{name} : Block {block.name} is inserted with a sheared transform, it is approximated")
+        params = get_insert_params(matrices)
+        blockrefs = []
+        for dxfattribs, insert, rotation, scale, extrusion in zip(dxfattribs_list, *(p.tolist() for p in params)):
+            dxfattribs.update(
+                {
+                    "rotation": rotation,
+                    "xscale": scale[0],
+                    "yscale": scale[1],
+                    "zscale": scale[2],
+                    "extrusion": extrusion,
+                }
+            )
+            blockrefs.append(layout.add_blockref(block.name, insert, dxfattribs=dxfattribs))
+        return blockrefs
+
+    def insert_block(self, layout, block, matrix, dxfattribs, name=None):
+        "Adds an INSERT of the block to the layout, placed with a 4x4 matrix"
+        return self.insert_blocks(layout, block, [matrix], [dxfattribs], None if name is None else [name])[0]
+
+    def get_collection_block(self, collection):
+        """Returns the BLOCK of an instanced collection. It is created on first use with the collection objects,
+        collections instanced by these objects are nested as INSERTs of their own BLOCK.
+        Instanced collections are usually excluded from the view layer : the content layers ignore the exclusion"""
+        block = self._collection_blocks.get(collection)
+        if block is not None:
+            return block
+        exp = self.exporter
+        block = self.initialize_block(collection.name)
+        self._collection_blocks[collection] = block
+        # The collection instance offset is the origin of the block
+        offset = Matrix.Translation(-collection.instance_offset)
+        for obj in collection.all_objects:
+            if is_collection_instance(obj):
+                dxfattribs = exp.get_dxf_attribs(obj, check_excluded=False)
+                if not dxfattribs:
+                    continue
+                nested_block = self.get_collection_block(obj.instance_collection)
+                self.insert_block(block, nested_block, offset @ obj.matrix_world, dxfattribs, obj.name)
+            elif obj.type in self.instance_types:
+                exp.write_mesh_object(obj, layout=block, matrix=offset @ obj.matrix_world, check_excluded=False)
+        return block
+
+    def export_collection_instances(self, objs):
+        "Export Empties instancing a collection as INSERTs of the collection BLOCK"
         exp = self.exporter
-        scale = matrix.to_scale()
-        dxfattribs.update(
-            {
-                "xscale": scale[0],
-                "yscale": scale[1],
-                "zscale": scale[2],
-            }
-        )
-
-        # Add a new block instance at origin
-        blockref = exp.msp.add_blockref(block.name, insert=(0, 0, 0), dxfattribs=dxfattribs)
-        # Place the block in 3D and rotate it accordingly
-        ucs = UCS(origin=matrix.to_translation()).rotate((raa[1], raa[2], raa[3]), raa[0])
-        blockref.transform(ucs.matrix)
-
-        if callback:
-            callback(blockref)
+        for obj in objs:
+            dxfattribs = exp.get_dxf_attribs(obj)
+            if not dxfattribs:
+                continue
+            block = self.get_collection_block(obj.instance_collection)
+            self.insert_block(exp.msp, block, exp.transform_exporter.get_matrix(obj), dxfattribs, obj.name)
+            exp.flush_entities()
+
+    def export_object_instances(self, instancers):
+        """Export the instances generated by objects (geometry nodes, particles, vertices and faces instancing) as INSERTs.
+        One BLOCK is created per instanced geometry, INSERTs take the layer and color of the instancer"""
+        exp = self.exporter
+        depsgraph = exp.context.evaluated_depsgraph_get()
+        instancers = {obj for obj in instancers if not is_collection_instance(obj)}
+        if not instancers:
+            return
+        blocks = {}
+        # Matrices and dxfattribs of the INSERTs of each block, INSERTs are added in one batch per block
+        inserts = {}
+        instancers_dxfattribs = {}
+        for instance in depsgraph.object_instances:
+            # Instances are only valid during the iteration, everything needed is read right away
+            if not instance.is_instance:
+                continue
+            instancer = instance.parent.original
+            if instancer not in instancers:
+                continue
+            instance_obj = instance.object
+            if instance_obj.type not in self.instance_types:
+                continue
+            if instancer not in instancers_dxfattribs:
+                instancers_dxfattribs[instancer] = exp.get_dxf_attribs(instancer)
+            dxfattribs = instancers_dxfattribs[instancer]
+            if not dxfattribs:
+                continue
+            key = instance_obj.data.as_pointer()
+            block = blocks.get(key)
+            if block is None:
+                block = self.initialize_block(instance_obj.data.name)
+                blocks[key] = block
+                inserts[key] = ([], [], [])
+                mesh = instance_obj.to_mesh()
+                try:
+                    exp.write_mesh_object(instancer, layout=block, matrix=Matrix(), mesh=mesh)
+                finally:
+                    instance_obj.to_mesh_clear()
+            matrices, dxfattribs_list, names = inserts[key]
+            matrices.append(exp.transform_exporter.to_export_space(instance.matrix_world))
+            dxfattribs_list.append(dxfattribs.copy())
+            names.append(instancer.name)
+        for key, (matrices, dxfattribs_list, names) in inserts.items():
+            self.insert_blocks(exp.msp, blocks[key], matrices, dxfattribs_list, names)
+            exp.flush_entities()
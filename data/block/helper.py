@@ -0,0 +1,84 @@
+import hashlib
+import numpy as np
+
+# Vertex coordinates are rounded before hashing so float noise doesn't split identical shapes
+GEOMETRY_HASH_DECIMALS = 5
+# Largest cosine between two axes of a matrix still considered orthogonal. Blender matrices are single precision
+SHEAR_TOLERANCE = 1e-5
+
+
+def is_collection_instance(obj):
+    "Returns True if the object is an Empty instancing a collection"
+    return obj.type == "EMPTY" and obj.instance_type == "COLLECTION" and obj.instance_collection is not None
+
+
+def get_geometry_hash(mesh_arrays, decimals=GEOMETRY_HASH_DECIMALS):
+    "Returns a digest of the mesh vertices, edges and polygons. Meshes with the same geometry give the same digest"
+    digest = hashlib.blake2b(digest_size=16)
+    # Adding 0.0 turns -0.0 into 0.0 so both give the same bytes
+    vertices = np.round(mesh_arrays.vertices, decimals) + 0.0
+    for array in (vertices, mesh_arrays.edges, mesh_arrays.loop_vertices, mesh_arrays.loop_totals):
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def get_ocs_axes(extrusions):
+    "Returns the OCS x and y axes of (N, 3) unit extrusion vectors, following the DXF arbitrary axis algorithm"
+    near_z = (np.abs(extrusions[:, 0]) < 1 / 64) & (np.abs(extrusions[:, 1]) < 1 / 64)
+    x_axes = np.where(near_z[:, None], np.cross((0, 1, 0), extrusions), np.cross((0, 0, 1), extrusions))
+    x_axes /= np.linalg.norm(x_axes, axis=1)[:, None]
+    y_axes = np.cross(extrusions, x_axes)
+    return x_axes, y_axes
+
+
+def get_sheared(matrices, tolerance=SHEAR_TOLERANCE):
+    "Returns a (N,) bool array, True for the (N, 4, 4) matrices whose axes aren't orthogonal. INSERTs can't be sheared"
+    axes = matrices[:, :3, :3]
+    lengths = np.linalg.norm(axes, axis=1)
+    # Null axes (flattened by a zero scale) are orthogonal to the others
+    units = axes / np.where(lengths > 0, lengths, 1.0)[:, None, :]
+    x_units, y_units, z_units = units[:, :, 0], units[:, :, 1], units[:, :, 2]
+    cosines = np.stack(
+        (
+            np.einsum("ij,ij->i", x_units, y_units),
+            np.einsum("ij,ij->i", x_units, z_units),
+            np.einsum("ij,ij->i", y_units, z_units),
+        ),
+        axis=1,
+    )
+    return np.any(np.abs(cosines) > tolerance, axis=1)
+
+
+def get_insert_params(matrices):
+    """Returns the insert points, rotations (degrees), scales and extrusions of INSERTs placed with (N, 4, 4) matrices.
+    The matrices are decomposed at once, mirroring is stored as a negative y scale.
+    Sheared matrices (see get_sheared) can't be represented, their INSERTs keep the axes directions and lengths only"""
+    axes = matrices[:, :3, :3]
+    translations = matrices[:, :3, 3]
+    x_cols, y_cols, z_cols = axes[:, :, 0], axes[:, :, 1], axes[:, :, 2]
+
+    z_scales = np.linalg.norm(z_cols, axis=1)
+    extrusions = np.tile((0.0, 0.0, 1.0), (len(matrices), 1))
+    has_z = z_scales > 0
+    extrusions[has_z] = z_cols[has_z] / z_scales[has_z, None]
+    ocs_x, ocs_y = get_ocs_axes(extrusions)
+
+    # The block x axis, expressed in OCS, gives the rotation around the extrusion
+    x_ocs = np.stack((np.einsum("ij,ij->i", x_cols, ocs_x), np.einsum("ij,ij->i", x_cols, ocs_y)), axis=1)
+    rotations = np.degrees(np.arctan2(x_ocs[:, 1], x_ocs[:, 0]))
+    x_scales = np.linalg.norm(x_cols, axis=1)
+    y_scales = np.linalg.norm(y_cols, axis=1) * np.where(np.linalg.det(axes) < 0, -1.0, 1.0)
+
+    # INSERT insert points are OCS coordinates
+    inserts = np.stack(
+        (
+            np.einsum("ij,ij->i", translations, ocs_x),
+            np.einsum("ij,ij->i", translations, ocs_y),
+            np.einsum("ij,ij->i", translations, extrusions),
+        ),
+        axis=1,
+    )
+    scales = np.stack((x_scales, y_scales, z_scales), axis=1)
+    return inserts, rotations, scales, extrusions
@@ -69,3 +69,17 @@ class DataSettings(bpy.types.PropertyGroup):
         description="Export objects that share the same mesh data as Block entities, unless the object has an active modifier.",
         default=True,
     )
+
+    use_instances: BoolProperty(
+        name="Instances as Blocks",
+        description="Export collection instances and instances generated by objects "
+        "(geometry nodes, particles, vertices and faces instancing) as nested Block entities",
+        default=False,
+    )
+
+    use_geometry_blocks: BoolProperty(
+        name="Identical geometry as Blocks",
+        description="Also export objects with identical evaluated geometry as Block entities, "
+        "even if they don't share mesh data or have modifiers. Slower, every object is evaluated twice",
+        default=False,
+    )
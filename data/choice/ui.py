@@ -63,6 +63,18 @@ def draw_choice_settings(settings, layout, context):
         if prop == "texts_export" and getattr(self, prop) == TextType.MTEXT.value:
             settings.text.draw(col)
 
+        # Draw mesh settings if exporting lines or polylines
+        if prop == "lines_export" and getattr(self, prop) != NO_EXPORT:
+            settings.mesh.draw(col, getattr(self, prop))
+
+        # Draw curve settings if exporting polylines
+        if prop == "curves_export" and getattr(self, prop) == CurveType.POLYLINE.value:
+            settings.curve.draw(col)
+
+        # Draw grease pencil settings if exporting grease pencils
+        if prop == "gpencil_export" and getattr(self, prop) != NO_EXPORT:
+            settings.grease_pencil.draw(col)
+
         if is_export and not entities_settings.use_default:
             split = col.split(factor=0.02)
             split.label(text="")
@@ -80,4 +92,8 @@ def draw_choice_settings(settings, layout, context):
         dim_row.label(text="Measures")
         dim_row.prop(self, "dimensions_export", text="")
 
+    geometry_box.prop(self, "use_instances")
     geometry_box.prop(self, "use_blocks")
+    geometry_row = geometry_box.row()
+    geometry_row.active = self.use_blocks
+    geometry_row.prop(self, "use_geometry_blocks")
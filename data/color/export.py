@@ -1,3 +1,4 @@
+from ezdxf.colors import float2transparency
 from ezdxf_exporter.core.export.prop import DataExporter
 from .constants import EntityColor
 from .helper import (
@@ -17,7 +18,9 @@ class ColorExporter(DataExporter):
         dxfattribs["color"] = self.get_ACI_color(color_settings)  # Set Bylayer, Byblock, or other color on entity
         obj_color, obj_alpha = self.get_color(obj, color_settings)
         if (obj_alpha or obj_alpha == 0) and color_settings.entity_color_use_transparency:
-            dxfattribs["transparency"] = 1 - obj_alpha
+            transparency = 1 - obj_alpha
+            if transparency:
+                dxfattribs["transparency"] = float2transparency(transparency / 10)
         if obj_color and dxfattribs["color"] == 257:  # 257 is True Color
             dxfattribs["true_color"] = int(rgb_to_hex(obj_color, 256), 16)
         return True
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from .constants import ACI_RGB_MAPPING, ACIColor, EntityColor
 
 
@@ -57,3 +58,13 @@ def get_object_color(obj):
 def get_material_color(mat):
     "Returns the material color as a 0-255 rgb color + alpha"
     return get_256_rgb_a(mat.diffuse_color)
+
+
+@lru_cache(maxsize=None)
+def get_nearest_aci(rgb):
+    "Returns the Autocad Color Index closest to a 0-255 rgb color"
+    rgb = [channel / 255 for channel in rgb]
+    return min(
+        range(1, len(ACI_RGB_MAPPING)),
+        key=lambda i: sum((c1 - c2) ** 2 for c1, c2 in zip(ACI_RGB_MAPPING[i], rgb)),
+    )
@@ -4,5 +4,6 @@ from ezdxf_exporter.core.constants import NO_EXPORT
 
 class CurveType(Enum):
     NONE = NO_EXPORT
-    # SPLINE = 'Spline'
+    SPLINE = "Spline"
+    POLYLINE = "Polyline"
     MESH = "Mesh"
@@ -1,14 +1,72 @@
+import numpy as np
 from ezdxf_exporter.core.export.prop import DataExporter
+from ezdxf_exporter.data.transform.helper import transform_vertices
+from .helper import get_bezier_bspline, get_nurbs_bspline, get_poly_bspline, flatten_bspline
 
 
 class SplineExporter(DataExporter):
-    def write_curve(self, layout, curve_obj, matrix, raa, dxfattribs, callback):
-        "Export curve object as Spline"
-        # This is mostly not working
+    def get_bspline(self, spline):
+        "Returns the control points, order, knots and weights of a Blender spline, None if it can't be exported"
+        if spline.type == "BEZIER":
+            bspline = get_bezier_bspline(spline)
+            return None if bspline is None else (bspline[0], 4, bspline[1], None)
+        elif spline.type == "NURBS":
+            return get_nurbs_bspline(spline)
+        elif spline.type == "POLY":
+            bspline = get_poly_bspline(spline)
+            return None if bspline is None else (bspline[0], 2, bspline[1], None)
+        return None
+
+    def write_curve(self, layout, curve_obj, matrix, dxfattribs, callback=None):
+        "Export curve object as Spline entities, one per Blender spline"
         curve = curve_obj.data
         for spline in curve.splines:
-            if len(spline.points) > 0:
-                spline = layout.add_spline([(matrix @ p.co)[0:3] for p in spline.points])
+            bspline = self.get_bspline(spline)
+            if bspline is None:
+                continue
+            control_points, order, knots, weights = bspline
+            # B-splines are affine invariant : transforming the control points transforms the curve
+            dxf_spline = layout.add_spline(degree=order - 1, dxfattribs=dxfattribs)
+            dxf_spline.control_points = transform_vertices(control_points, matrix).tolist()
+            dxf_spline.knots = knots.tolist()
+            if weights is not None:
+                dxf_spline.weights = weights.tolist()
+                dxf_spline.set_flag_state(dxf_spline.RATIONAL, True)
+            if spline.type == "NURBS" and spline.use_cyclic_u:
+                # Bezier and poly splines are closed by their control points, cyclic NURBS wrap theirs
+                dxf_spline.set_flag_state(dxf_spline.CLOSED | dxf_spline.PERIODIC, True)
+            if callback is not None:
+                callback(dxf_spline)
+
+    def write_curve_polylines(self, layout, curve_obj, matrix, dxfattribs, callback=None):
+        """Export curve object as Polyline entities, one per Blender spline, flattened within the curve tolerance.
+        Splines in the XY plane are LWPOLYLINEs, with arcs as bulges if enabled. Others are 3D POLYLINEs"""
+        settings = self.exporter.settings.curve
+        tolerance = settings.tolerance
+        for spline in curve_obj.data.splines:
+            bspline = self.get_bspline(spline)
+            if bspline is None:
+                continue
+            control_points, order, knots, weights = bspline
+            control_points = transform_vertices(control_points, matrix)
+            # The curve lies within the convex hull of its control points
+            elevation = control_points[0, 2]
+            is_planar = np.all(np.abs(control_points[:, 2] - elevation) <= tolerance)
+            vertices = flatten_bspline(
+                control_points, order, knots, weights, tolerance, use_bulges=settings.use_bulges and is_planar
+            )
+            closed = spline.use_cyclic_u
+            if closed and len(vertices) > 2:
+                # The last vertex is the first one, the bulge of the closing segment is on the vertex before it
+                vertices.pop()
+            if is_planar:
+                polyline = layout.add_lwpolyline(
+                    [(x, y, bulge) for x, y, _, bulge in vertices],
+                    format="xyb",
+                    close=closed,
+                    dxfattribs={**dxfattribs, "elevation": elevation},
+                )
             else:
-                spline = layout.add_spline([matrix @ p.co for p in spline.bezier_points])
-            callback(spline)
+                polyline = layout.add_polyline3d([v[:3] for v in vertices], close=closed, dxfattribs=dxfattribs)
+            if callback is not None:
+                callback(polyline)
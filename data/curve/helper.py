@@ -0,0 +1,205 @@
+"""
+Conversion of Blender splines to B-spline control points, knots and weights
+"""
+
+import numpy as np
+from ezdxf.math import (
+    ConstructionCircle,
+    Vec3,
+    bulge_3_points,
+    distance_point_line_3d,
+    open_uniform_knot_vector,
+)
+from ezdxf_exporter.core.shared_maths import get_co_array
+
+
+def get_bezier_points(spline):
+    "Returns the control points, left handles and right handles of a bezier spline as (N, 3) arrays"
+    bezier_points = spline.bezier_points
+    return (
+        get_co_array(bezier_points),
+        get_co_array(bezier_points, attr="handle_left"),
+        get_co_array(bezier_points, attr="handle_right"),
+    )
+
+
+def get_bezier_bspline(spline):
+    """Returns the cubic B-spline control points and knots of a bezier spline, None if it has less than one segment.
+    Each bezier segment is 4 control points sharing their ends, inner knots are repeated 3 times"""
+    co, left, right = get_bezier_points(spline)
+    # Each point starts a segment : point, right handle, left handle of the next point
+    segments = np.stack((co, right, np.roll(left, -1, axis=0)), axis=1)
+    if not spline.use_cyclic_u:
+        segments = segments[:-1]
+    count = len(segments)
+    if count == 0:
+        return None
+    last = co[0] if spline.use_cyclic_u else co[-1]
+    control_points = np.concatenate((segments.reshape(-1, 3), last[None]))
+    knots = np.concatenate(((0,), np.repeat(np.arange(count + 1), 3), (count,))).astype(np.float64)
+    return control_points, knots
+
+
+def get_nurbs_knots(count, order, cyclic, endpoint, bezier):
+    "Returns the knot vector Blender computes for a NURBS spline with count points and these flags"
+    # Port of Blender's calcknots
+    repeat_inner = order - 1 if bezier else 1
+    if endpoint:
+        head = order - (1 if cyclic else 0)
+    else:
+        head = min(2, repeat_inner) if bezier else 1
+    tail = 2 * order - 1 if cyclic else (order if endpoint else 0)
+    knot_count = count + order + (order - 1 if cyclic else 0)
+    knots = np.zeros(knot_count, dtype=np.float64)
+    current = 0.0
+    offset = 1 if endpoint and cyclic else 0
+    if offset:
+        current += 1.0
+    r = head
+    for i in range(offset, knot_count - tail):
+        knots[i] = current
+        r -= 1
+        if r == 0:
+            current += 1.0
+            r = repeat_inner
+    tail_index = knot_count - tail
+    for i in range(tail):
+        knots[tail_index + i] = current + knots[i] - knots[0]
+    return knots
+
+
+def get_nurbs_bspline(spline):
+    """Returns the B-spline control points, order, knots and weights of a NURBS spline, None if it has too few points
+    or an empty domain (Blender doesn't display it either). Cyclic splines repeat their first points.
+    Weights are None if they are all equal to 1"""
+    points = get_co_array(spline.points, size=4)
+    count = len(points)
+    order = min(spline.order_u, count)
+    if order < 2:
+        return None
+    knots = get_nurbs_knots(count, order, spline.use_cyclic_u, spline.use_endpoint_u, spline.use_bezier_u)
+    if spline.use_cyclic_u:
+        points = np.concatenate((points, points[: order - 1]))
+    if knots[order - 1] >= knots[len(points)]:
+        return None
+    weights = points[:, 3]
+    if np.all(weights == 1):
+        weights = None
+    return points[:, :3], order, knots, weights
+
+
+def get_poly_bspline(spline):
+    "Returns the degree 1 B-spline control points and knots of a poly spline, None if it has less than 2 points"
+    points = get_co_array(spline.points, size=4)[:, :3]
+    if spline.use_cyclic_u and len(points):
+        points = np.concatenate((points, points[:1]))
+    if len(points) < 2:
+        return None
+    return points, np.array(open_uniform_knot_vector(len(points), 2), dtype=np.float64)
+
+
+class BSplineEvaluator:
+    """Evaluates a B-spline with de Boor's algorithm in homogeneous coordinates.
+    The knot span of a parameter is found explicitly : the end of the domain is evaluated from the last non empty span,
+    whatever the multiplicity of its knot (Blender splines without the endpoint flag aren't clamped)"""
+
+    def __init__(self, control_points, order, knots, weights=None):
+        self.degree = order - 1
+        self.knots = np.asarray(knots, dtype=np.float64)
+        weights = np.ones(len(control_points)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.points = np.hstack((control_points * weights[:, None], weights[:, None]))
+        self.end = self.knots[len(control_points)]
+
+    def get_span(self, t):
+        "Returns the index i of the knot span knots[i] <= t < knots[i + 1] used to evaluate t"
+        knots = self.knots
+        if t >= self.end:
+            # Last span ending at the domain end
+            return int(np.searchsorted(knots, self.end, side="left")) - 1
+        return max(int(np.searchsorted(knots, t, side="right")) - 1, self.degree)
+
+    def point(self, t):
+        "Returns the point of the curve at parameter t as a Vec3"
+        degree = self.degree
+        knots = self.knots
+        span = self.get_span(t)
+        points = self.points[span - degree : span + 1].copy()
+        for r in range(1, degree + 1):
+            for j in range(degree, r - 1, -1):
+                i = span - degree + j
+                length = knots[i + degree - r + 1] - knots[i]
+                alpha = 0.0 if length == 0 else (t - knots[i]) / length
+                points[j] = (1.0 - alpha) * points[j - 1] + alpha * points[j]
+        x, y, z, w = points[degree].tolist()
+        return Vec3(x / w, y / w, z / w)
+
+
+# Recursion limit of the adaptive subdivision : a span is split in 2 ** MAX_SUBDIVISIONS segments at most
+MAX_SUBDIVISIONS = 12
+
+
+def get_chord_distance(point, start, end):
+    "Returns the distance from point to the segment chord. Degenerated chords use the distance to the start point"
+    try:
+        return distance_point_line_3d(point, start, end)
+    except ZeroDivisionError:
+        return point.distance(start)
+
+
+def subdivide_span(evaluator, start, end, t0, t1, tolerance, depth=0):
+    "Yields the points approximating the curve from start (excluded) at t0 to end at t1 within tolerance"
+    t_mid = (t0 + t1) / 2
+    mid = evaluator.point(t_mid)
+    if depth >= MAX_SUBDIVISIONS or get_chord_distance(mid, start, end) < tolerance:
+        yield end
+    else:
+        yield from subdivide_span(evaluator, start, mid, t0, t_mid, tolerance, depth + 1)
+        yield from subdivide_span(evaluator, mid, end, t_mid, t1, tolerance, depth + 1)
+
+
+def get_arc_bulge(evaluator, start, end, t0, t1, tolerance, samples=8):
+    "Returns the bulge of the span if it is a circular arc in the XY plane within tolerance, None otherwise"
+    mid = evaluator.point((t0 + t1) / 2)
+    # Straight spans are a single segment anyway
+    if get_chord_distance(mid, start, end) < tolerance:
+        return None
+    try:
+        circle = ConstructionCircle.from_3p(start, mid, end)
+    except ArithmeticError:
+        return None
+    for t in np.linspace(t0, t1, samples + 2)[1:-1].tolist():
+        point = evaluator.point(t)
+        if abs(circle.center.distance(point.vec2) - circle.radius) > tolerance:
+            return None
+    return bulge_3_points(start, end, mid)
+
+
+def flatten_bspline(control_points, order, knots, weights, tolerance, use_bulges=False, segments=2):
+    """Returns a polyline approximating the B-spline within tolerance, as a list of [x, y, z, bulge] vertices.
+    Each knot span is split in segments, then subdivided until the chord is closer than tolerance to the curve.
+    If use_bulges, spans that are circular arcs are a single vertex with a bulge : the curve must lie in the XY plane"""
+    if order == 2:
+        # Degree 1 : the control points are the polyline
+        return [[x, y, z, 0.0] for x, y, z in control_points.tolist()]
+    evaluator = BSplineEvaluator(control_points, order, knots, weights)
+    spans = np.unique(knots[order - 1 : len(control_points) + 1]).tolist()
+    start = evaluator.point(spans[0])
+    vertices = [[start.x, start.y, start.z, 0.0]]
+    for t0, t1 in zip(spans, spans[1:]):
+        end = evaluator.point(t1)
+        bulge = get_arc_bulge(evaluator, start, end, t0, t1, tolerance) if use_bulges else None
+        if bulge is not None:
+            vertices[-1][3] = bulge
+            vertices.append([end.x, end.y, end.z, 0.0])
+        else:
+            params = np.linspace(t0, t1, segments + 1).tolist()
+            span_start = start
+            for t_start, t_end in zip(params, params[1:]):
+                span_end = evaluator.point(t_end)
+                vertices.extend(
+                    [p.x, p.y, p.z, 0.0]
+                    for p in subdivide_span(evaluator, span_start, span_end, t_start, t_end, tolerance)
+                )
+                span_start = span_end
+        start = end
+    return vertices
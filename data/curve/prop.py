@@ -0,0 +1,24 @@
+import bpy
+from bpy.props import (
+    BoolProperty,
+    FloatProperty,
+)
+from .ui import draw
+
+
+class CurveSettings(bpy.types.PropertyGroup):
+    tolerance: FloatProperty(
+        name="Tolerance",
+        description="Maximum distance between the curve and the exported polyline, in export units",
+        default=0.01,
+        min=1e-6,
+        precision=4,
+    )
+    use_bulges: BoolProperty(
+        name="Arcs as Bulges",
+        description="Export circular arcs as a single polyline segment with a bulge. Only for curves in the XY plane",
+        default=True,
+    )
+
+    def draw(self, layout):
+        draw(self, layout)
@@ -0,0 +1,6 @@
+def draw(curve_data, layout):
+    box = layout.box()
+    box.label(text="Curve Options")
+    row = box.row(align=True)
+    row.prop(curve_data, "tolerance")
+    row.prop(curve_data, "use_bulges", toggle=True)
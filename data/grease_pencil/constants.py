@@ -6,3 +6,13 @@ class GreasePencilType(Enum):
     NONE = NO_EXPORT
     MESH = "MESH"
     # CURVES = "CURVES"
+
+
+class GreasePencilFrames(Enum):
+    ACTIVE = "Active Frame"
+    RANGE = "Frame Range"
+
+
+class GreasePencilFrameOutput(Enum):
+    LAYER = "Layer per Frame"
+    BLOCK = "Block per Frame"
@@ -1,15 +1,62 @@
+from collections import defaultdict
+
+import numpy as np
 from ezdxf_exporter.core.export.prop import DataExporter
+from ezdxf_exporter.data.transform.helper import transform_vertices
+from .constants import GreasePencilFrames, GreasePencilFrameOutput
+from .helper import get_frame_points
 
 
 class GreasePencilExporter(DataExporter):
-    def write_gpencil_object(self, layout, gpencil_object, dxfattribs, callback, matrix):
-        "Export gp object as Edges"
+    def get_frames(self, gpencil_object):
+        """Returns a dict with frame numbers as keys and the frames to export (one per layer at most) as values.
+        With the active frame option, the evaluated frames are stored under the None key"""
+        exp = self.exporter
+        settings = exp.settings.grease_pencil
+        frames = defaultdict(list)
+        if settings.frames == GreasePencilFrames.ACTIVE.value:
+            for layer in gpencil_object.data.layers:
+                if layer.active_frame is not None:
+                    frames[None].append(layer.active_frame)
+        else:
+            # Modifiers are only evaluated on the active frame, keyframes are read from the original data
+            frame_start, frame_end = settings.get_frame_range(exp.context)
+            for layer in gpencil_object.original.data.layers:
+                for frame in layer.frames:
+                    if frame_start <= frame.frame_number <= frame_end:
+                        frames[frame.frame_number].append(frame)
+        return frames
 
-        gp = gpencil_object.data
+    def write_frames(self, layout, frames, dxfattribs, matrix, callback=None):
+        "Export the strokes of the frames as polylines. Points of each frame are transformed at once"
         z_scale_export = self.exporter.settings.transform.export_scale[2]
         polyline_func = layout.add_lwpolyline if z_scale_export == 0 else layout.add_polyline3d
-        for layer in gp.layers:
-            for stroke in layer.frames[0].strokes:
-                polyline = polyline_func([matrix @ point.co for point in stroke.points], dxfattribs=dxfattribs)
-                callback(polyline)
-                
+        for frame in frames:
+            co, counts, cyclic = get_frame_points(frame)
+            strokes = np.split(transform_vertices(co, matrix), np.cumsum(counts)[:-1])
+            for points, closed in zip(strokes, cyclic.tolist()):
+                if len(points) < 2:
+                    continue
+                polyline = polyline_func(points.tolist(), close=closed, dxfattribs=dxfattribs)
+                if callback is not None:
+                    callback(polyline)
+
+    def write_gpencil_object(self, layout, gpencil_object, dxfattribs, matrix, callback=None):
+        "Export gp object as Edges. In frame range mode, each frame goes on its own layer or in its own block"
+        exp = self.exporter
+        frames_dict = self.get_frames(gpencil_object)
+        if None in frames_dict:
+            self.write_frames(layout, frames_dict[None], dxfattribs, matrix, callback)
+            return
+        frame_output = exp.settings.grease_pencil.frame_output
+        for frame_number, frames in sorted(frames_dict.items()):
+            if frame_output == GreasePencilFrameOutput.LAYER.value:
+                frame_dxfattribs = dict(dxfattribs)
+                frame_dxfattribs["layer"] = exp.layer_exporter.get_or_create_sub_layer(
+                    dxfattribs.get("layer", "0"), f"_{frame_number}"
+                )
+                self.write_frames(layout, frames, frame_dxfattribs, matrix, callback)
+            else:
+                block = exp.block_exporter.initialize_block(f"{gpencil_object.name}_{frame_number}")
+                self.write_frames(block, frames, dxfattribs, matrix, callback)
+                layout.add_blockref(block.name, (0, 0, 0), dxfattribs=dxfattribs)
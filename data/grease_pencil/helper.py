@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def get_frame_points(frame):
+    """Returns the points of every stroke of a grease pencil frame as one (N, 3) array,
+    with the points count and the cyclic state of each stroke"""
+    strokes = frame.strokes
+    counts = np.empty(len(strokes), dtype=np.int32)
+    cyclic = np.empty(len(strokes), dtype=bool)
+    strokes.foreach_get("use_cyclic", cyclic)
+    for i, stroke in enumerate(strokes):
+        counts[i] = len(stroke.points)
+    co = np.empty(counts.sum() * 3, dtype=np.float32)
+    offset = 0
+    # Each stroke fills its own slice of the shared buffer
+    for stroke, count in zip(strokes, counts.tolist()):
+        stroke.points.foreach_get("co", co[offset : offset + count * 3])
+        offset += count * 3
+    return co.reshape(-1, 3).astype(np.float64), counts, cyclic
@@ -0,0 +1,39 @@
+import bpy
+from bpy.props import (
+    EnumProperty,
+    IntProperty,
+    BoolProperty,
+)
+from .constants import GreasePencilFrames, GreasePencilFrameOutput
+from .ui import draw
+
+
+class GreasePencilSettings(bpy.types.PropertyGroup):
+    frames: EnumProperty(
+        name="Frames",
+        description="Export the frame displayed in the viewport, or every keyframe in a frame range",
+        default=GreasePencilFrames.ACTIVE.value,
+        items=[(f.value,) * 3 for f in GreasePencilFrames],
+    )
+    frame_output: EnumProperty(
+        name="Output",
+        description="Put the strokes of each frame on their own layer, or in their own block",
+        default=GreasePencilFrameOutput.LAYER.value,
+        items=[(o.value,) * 3 for o in GreasePencilFrameOutput],
+    )
+    use_scene_range: BoolProperty(
+        name="Scene Range",
+        description="Use the scene start and end frames",
+        default=True,
+    )
+    frame_start: IntProperty(name="Start", default=1, min=0)
+    frame_end: IntProperty(name="End", default=250, min=0)
+
+    def get_frame_range(self, context):
+        "Returns the first and last frames to export"
+        if self.use_scene_range:
+            return context.scene.frame_start, context.scene.frame_end
+        return self.frame_start, self.frame_end
+
+    def draw(self, layout):
+        draw(self, layout)
@@ -0,0 +1,15 @@
+from .constants import GreasePencilFrames
+
+
+def draw(gp_data, layout):
+    box = layout.box()
+    box.label(text="Grease Pencil Options")
+    box.prop(gp_data, "frames")
+    if gp_data.frames == GreasePencilFrames.RANGE.value:
+        box.prop(gp_data, "frame_output")
+        range_row = box.row(align=True)
+        range_row.prop(gp_data, "use_scene_range", toggle=True)
+        sub_row = range_row.row(align=True)
+        sub_row.active = not gp_data.use_scene_range
+        sub_row.prop(gp_data, "frame_start")
+        sub_row.prop(gp_data, "frame_end")
@@ -10,14 +10,7 @@ from ezdxf_exporter.core.export.prop import DataExporter
 from ezdxf_exporter.core.preferences.helper import get_preferences
 
 
-def get_layer_collection(parent_col, search_name):
-    found = None
-    if parent_col.name == search_name:
-        return parent_col
-    for layer in parent_col.children:
-        found = get_layer_collection(layer, search_name)
-        if found:
-            return found
+INVALID_CHARS_TABLE = str.maketrans({char: "_" for char in ("/", "<", ">", "\\", "“", '"', ":", ";", "?", "*", "|", "=", "‘")})
 
 
 class LayerExporter(DataExporter):
@@ -27,17 +20,27 @@ class LayerExporter(DataExporter):
     KW_TRANSPARENCY = "transparency"
     KW_FREEZE = "freeze"
 
+    def __init__(self, exporter) -> None:
+        super().__init__(exporter)
+        self.preferences = get_preferences(exporter.context).settings.layer
+        # Resolved layer names for the duration of the export, see get_layer_key
+        self._layer_names = {}
+
     def populate_dxfattribs(
-        self, obj: bpy.types.Object, dxfattribs: Dict[str, any], entity_type: Enum, override: bool = True
+        self,
+        obj: bpy.types.Object,
+        dxfattribs: Dict[str, any],
+        entity_type: Enum,
+        override: bool = True,
+        check_excluded: bool = True,
     ) -> bool:
-        "Populates the 'Layer' key of dxfattribs dict, returns False if no layer should be created"
-        dxfattribs["layer"] = self.get_or_create_layer_from_obj(obj, entity_type, override)
+        """Populates the 'Layer' key of dxfattribs dict, returns False if no layer should be created.
+        If not check_excluded, the layer doesn't depend on the object or its collection being excluded or hidden"""
+        dxfattribs["layer"] = self.get_or_create_layer_from_obj(obj, entity_type, override, check_excluded)
         return dxfattribs["layer"] is not None
 
     def sanitize_name(self, name):
-        for char in ("/", "<", ">", "\\", "“", '"', ":", ";", "?", "*", "|", "=", "‘"):
-            name = name.replace(char, "_")
-        return name
+        return name.translate(INVALID_CHARS_TABLE)
 
     def create_layer(
         self, name: str, rgb=None, color=None, transparency: float = None, freeze: bool = False, override: bool = True
@@ -63,9 +66,17 @@ class LayerExporter(DataExporter):
             layer.freeze()
         return layer
 
+    def get_or_create_sub_layer(self, layer_name: str, suffix: str) -> str:
+        "Returns the name of a layer with the properties of layer_name and a suffixed name. It is created if needed"
+        layers = self.exporter.doc.layers
+        name = self.sanitize_name(layer_name + suffix)
+        if name not in layers:
+            layers.duplicate_entry(layer_name, name)
+        return name
+
     def get_or_create_layer_from_mat(self, mat: bpy.types.Material, override=True):
         rgb, a = get_material_color(mat)
-        name = get_preferences(self.exporter.context).settings.layer.material_prefix + mat.name
+        name = self.preferences.material_prefix + mat.name
         return self.create_layer(
             name,
             rgb,
@@ -73,20 +84,57 @@ class LayerExporter(DataExporter):
             override=override,
         )
 
-    def get_or_create_layer_from_obj(self, obj: bpy.types.Object, entity_type: Enum, override: bool = True) -> str:
+    def get_layer_key(
+        self,
+        obj: bpy.types.Object,
+        layer_settings,
+        entity_type: Enum,
+        prefix: str,
+        suffix: str,
+        override: bool,
+        check_excluded: bool,
+    ):
+        "Returns a key identifying the layer of obj : Objects with the same key are on the same layer"
+        layer_to = layer_settings.entity_layer_to
+        if layer_to == EntityLayer.COLLECTION.value:
+            source = obj.users_collection[0]
+        elif layer_to == EntityLayer.DATA_NAME.value:
+            source = obj.data
+        elif layer_to == EntityLayer.OBJECT_NAME.value:
+            source = obj
+        elif layer_to == EntityLayer.MATERIAL.value:
+            source = obj.data.materials[0] if obj.data.materials else None
+        elif layer_to == EntityLayer.SCENE_NAME.value:
+            source = self.exporter.context.scene
+        elif layer_to == EntityLayer.CUSTOM_PROP.value:
+            source = str(obj.get(layer_settings.entity_layer_to_custom, 0))
+        else:
+            source = None
+        return (layer_to, source, entity_type, prefix, suffix, override, check_excluded)
+
+    def get_or_create_layer_from_obj(
+        self, obj: bpy.types.Object, entity_type: Enum, override: bool = True, check_excluded: bool = True
+    ) -> str:
         "Create the layer if needed and returns its name. Depends on the type of obj passed as parameter"
+        layer_settings = self.exporter.settings.get_entity_settings(entity_type).layer
+        prefix = layer_settings.entity_layer_prefix
+        suffix = self.preferences.get_sub_layer_suffix(entity_type) if layer_settings.entity_layer_separate else ""
+        suffix += layer_settings.entity_layer_suffix
+
+        key = self.get_layer_key(obj, layer_settings, entity_type, prefix, suffix, override, check_excluded)
+        if key not in self._layer_names:
+            self._layer_names[key] = self._create_layer_from_obj(
+                obj, layer_settings, prefix, suffix, override, check_excluded
+            )
+        return self._layer_names[key]
+
+    def _create_layer_from_obj(
+        self, obj: bpy.types.Object, layer_settings, prefix: str, suffix: str, override: bool, check_excluded: bool
+    ):
         exp = self.exporter
         context = exp.context
         exp_settings = exp.settings
-        layer_settings = exp_settings.get_entity_settings(entity_type).layer
         layer_to = layer_settings.entity_layer_to
-        prefix = layer_settings.entity_layer_prefix
-        suffix = (
-            get_preferences(exp.context).settings.layer.get_sub_layer_suffix(entity_type)
-            if layer_settings.entity_layer_separate
-            else ""
-        )
-        suffix += layer_settings.entity_layer_suffix
 
         settings = {}
 
@@ -106,8 +154,8 @@ class LayerExporter(DataExporter):
             coll = obj.users_collection[0]
             if coll is None:
                 return None
-            layer_coll = get_layer_collection(context.view_layer.layer_collection, coll.name)
-            excluded_from_view_layer = layer_coll.exclude if layer_coll is not None else False
+            _, excluded_from_view_layer = exp.layer_collections.get(coll.name, (None, False))
+            excluded_from_view_layer = excluded_from_view_layer and check_excluded
             col_exclude_state = exp_settings.filter.export_excluded
             if excluded_from_view_layer and col_exclude_state == ExcludedObject.NONE.value:
                 return None
@@ -122,7 +170,7 @@ class LayerExporter(DataExporter):
             if layer_settings.entity_layer_color == "1":
                 update_settings_with_custom_props(obj.data)
         elif layer_to == EntityLayer.OBJECT_NAME.value:
-            excluded_from_view_layer = obj.hide_get() or obj.hide_viewport
+            excluded_from_view_layer = check_excluded and (obj.hide_get() or obj.hide_viewport)
             obj_exclude_state = exp_settings.filter.export_excluded
             if excluded_from_view_layer and obj_exclude_state == ExcludedObject.NONE.value:
                 return None
@@ -1,6 +1,9 @@
-import bmesh
+from ezdxf.colors import int2rgb
 from ezdxf_exporter.data.mesh.constants import FaceType, LineType, PointType
+from ezdxf_exporter.data.color.helper import get_nearest_aci
 from ezdxf_exporter.core.export.prop import DataExporter
+from ezdxf_exporter.core.export.bulk import add_entities, set_mesh_data, set_polyface_data
+from ezdxf_exporter.data.mesh.helper import get_clean_edges, get_boundary_edges, chain_edges
 
 
 class MeshExporter(DataExporter):
@@ -15,15 +18,15 @@ class MeshExporter(DataExporter):
             PointType.POINTS.value: self._create_mesh_points,
         }
 
-    def get_mesh_method(self, mesh_setting, mesh):
+    def get_mesh_method(self, mesh_setting, mesh_arrays):
         # DXF Mesh object must(?) have faces (=polygons)
         # This switches the method to polylines if input mesh doesn't have any polygon
         mesh_method = self._mesh_creation_methods_dic.get(mesh_setting)
-        if mesh_method == self._create_mesh_mesh and len(mesh.polygons) == 0:
+        if mesh_method == self._create_mesh_mesh and mesh_arrays.polygons_count == 0:
             mesh_method = self._create_mesh_polylines
         return mesh_method
 
-    def triangulate_if_needed(self, mesh, obj_type):
+    def triangulate_if_needed(self, mesh_arrays, obj_type):
         "Make sure there is no N-Gon (not supported in DXF Faces)"
         if obj_type != "MESH" or self.exporter.settings.choice.faces_export not in (
             FaceType.FACES3D.value,
@@ -31,12 +34,8 @@ class MeshExporter(DataExporter):
             FaceType.MESH.value,
         ):
             return
-        if any(len(p.vertices) > 4 for p in mesh.polygons):
-            bm = bmesh.new()
-            bm.from_mesh(mesh)
-            bmesh.ops.triangulate(bm, faces=bm.faces[:])
-            bm.to_mesh(mesh)
-            bm.free()
+        if mesh_arrays.polygons_count and mesh_arrays.loop_totals.max() > 4:
+            mesh_arrays.triangulate()
 
     def create_mesh_point(self, layout, position, dxfattribs=None, callback=None):
         if dxfattribs is None:
@@ -45,70 +44,148 @@ class MeshExporter(DataExporter):
         if callback is not None:
             callback(point)
 
-    def _create_mesh_points(self, layout, mesh, dxfattribs, callback=None):
-        for v in mesh.vertices:
-            self.create_mesh_point(layout, v.co, dxfattribs, callback)
+    def _create_mesh_points(self, layout, mesh_arrays, dxfattribs, callback=None):
+        for co in mesh_arrays.vertices.tolist():
+            self.create_mesh_point(layout, co, dxfattribs, callback)
 
-    def _create_mesh_lines(self, layout, mesh, dxfattribs, callback=None):
-        for e in mesh.edges:
-            line = layout.add_line(
-                mesh.vertices[e.vertices[0]].co, mesh.vertices[e.vertices[1]].co, dxfattribs=dxfattribs
-            )
-            if callback is not None:
+    def get_lines_edges(self, mesh_arrays):
+        "Returns the edges to export as lines, cleaned of zero-length and duplicate edges if enabled"
+        if self.exporter.settings.mesh.use_clean_lines:
+            return get_clean_edges(mesh_arrays.vertices, mesh_arrays.edges)
+        return mesh_arrays.edges
+
+    def _create_mesh_lines(self, layout, mesh_arrays, dxfattribs, callback=None):
+        vertices = mesh_arrays.vertices
+        edges = self.get_lines_edges(mesh_arrays)
+        lines = add_entities(layout, "LINE", dxfattribs, {"start": vertices[edges[:, 0]], "end": vertices[edges[:, 1]]})
+        if callback is not None:
+            for line in lines:
                 callback(line)
 
-    def _create_mesh_polylines(self, layout, mesh, dxfattribs, callback=None):
-        vertices = mesh.vertices
+    def get_polylines(self, mesh_arrays):
+        """Returns the polylines to export as (vertex indices, is closed) tuples. Polygons are closed, loose edges are open.
+        Polygons can be replaced by the outline loops of their borders, loose edges can be joined into chains"""
+        settings = self.exporter.settings.mesh
+        polylines = []
+        if mesh_arrays.polygons_count:
+            if settings.use_outlines:
+                polylines.extend(chain_edges(get_boundary_edges(mesh_arrays.polygons_edges())))
+            else:
+                polylines.extend((p.tolist(), True) for p in mesh_arrays.polygons())
+        edges = mesh_arrays.loose_edges()
+        if settings.use_join_edges:
+            polylines.extend(chain_edges(edges))
+        else:
+            polylines.extend(([v1, v2], False) for v1, v2 in edges.tolist())
+        return polylines
+
+    def _create_mesh_polylines(self, layout, mesh_arrays, dxfattribs, callback=None):
+        vertices = mesh_arrays.vertices
         z_scale_export = self.exporter.settings.transform.export_scale[2]
         polyline_func = layout.add_lwpolyline if z_scale_export == 0 else layout.add_polyline3d
         new_entities = []
-        if mesh.polygons:
-            edges_not_part_of_a_polygon = set(tuple(sorted((e.vertices[0], e.vertices[1]))) for e in mesh.edges)
-            edges_part_of_a_polygon = set()
-            for p in mesh.polygons:
-                edges_part_of_a_polygon.update(tuple(sorted((k[0], k[1]))) for k in p.edge_keys)
-                polyline = polyline_func([vertices[v_idx].co for v_idx in p.vertices], dxfattribs=dxfattribs)
-                polyline.dxf.flags += 1  # Close Polyline
-                new_entities.append(polyline)
-            edges_not_part_of_a_polygon.difference_update(edges_part_of_a_polygon)
-            for v1, v2 in edges_not_part_of_a_polygon:
-                polyline = polyline_func((vertices[v1].co, vertices[v2].co), dxfattribs=dxfattribs)
-                new_entities.append(polyline)
-        else:
-            for e in mesh.edges:
-                polyline = polyline_func(
-                    (vertices[e.vertices[0]].co, vertices[e.vertices[1]].co),
-                    dxfattribs=dxfattribs,
-                )
-                new_entities.append(polyline)
+        for indices, closed in self.get_polylines(mesh_arrays):
+            polyline = polyline_func(vertices[indices].tolist(), close=closed, dxfattribs=dxfattribs)
+            new_entities.append(polyline)
         if callback is not None:
             for entity in new_entities:
                 callback(entity)
 
-    def _create_mesh_polyface(self, layout, mesh, dxfattribs, callback=None):
-        if len(mesh.polygons) > 0:
+    def _create_mesh_polyface(self, layout, mesh_arrays, dxfattribs, callback=None):
+        if mesh_arrays.polygons_count > 0:
+            if mesh_arrays.loop_totals.max() > 4:
+                # POLYFACE faces have 4 vertices at most
+                mesh_arrays.triangulate()
             polyface = layout.add_polyface(dxfattribs=dxfattribs)
-            polyface.append_faces(
-                [[mesh.vertices[v].co for v in f.vertices] for f in mesh.polygons], dxfattribs=dxfattribs
+            set_polyface_data(
+                polyface, mesh_arrays.vertices, mesh_arrays.loop_vertices, mesh_arrays.loop_totals, dxfattribs
             )
             if callback is not None:
                 callback(polyface)
 
-    def _create_mesh_3dfaces(self, layout, mesh, dxfattribs, callback=None):
-        for f in mesh.polygons:
-            face_3D = layout.add_3dface([mesh.vertices[v].co for v in f.vertices], dxfattribs=dxfattribs)
-            if callback is not None:
+    def _create_mesh_3dfaces(self, layout, mesh_arrays, dxfattribs, callback=None):
+        if mesh_arrays.polygons_count == 0:
+            return
+        if mesh_arrays.loop_totals.max() > 4:
+            # 3DFACEs have 4 vertices at most
+            mesh_arrays.triangulate()
+        faces = mesh_arrays.faces_co()
+        faces_3D = add_entities(layout, "3DFACE", dxfattribs, {f"vtx{i}": faces[:, i] for i in range(4)})
+        if callback is not None:
+            for face_3D in faces_3D:
                 callback(face_3D)
 
-    def _create_mesh_mesh(self, layout, mesh, dxfattribs, callback=None):
-        if len(mesh.polygons) > 0:
+    def _create_mesh_mesh(self, layout, mesh_arrays, dxfattribs, callback=None):
+        if mesh_arrays.polygons_count > 0:
             dxf_mesh = layout.add_mesh(dxfattribs)
-            with dxf_mesh.edit_data() as mesh_data:
-                mesh_data.vertices = [v.co for v in mesh.vertices]
-                mesh_data.faces = [f.vertices for f in mesh.polygons]
+            set_mesh_data(dxf_mesh, mesh_arrays.vertices, mesh_arrays.loop_vertices, mesh_arrays.loop_totals)
             if callback is not None:
                 callback(dxf_mesh)
 
     @classmethod
-    def get_evaluated_mesh(cls, obj, context):
-        return obj.evaluated_get(context.evaluated_depsgraph_get()).to_mesh()
+    def get_evaluated_mesh(cls, obj, depsgraph):
+        return obj.evaluated_get(depsgraph).to_mesh()
+
+    @classmethod
+    def clear_evaluated_mesh(cls, obj, depsgraph):
+        "Release the mesh created by get_evaluated_mesh"
+        obj.evaluated_get(depsgraph).to_mesh_clear()
+
+
+class R12MeshExporter(MeshExporter):
+    """Writes meshes with the R12 fast stream writer instead of the ezdxf document.
+    Layout is the R12FastStreamWriter, dxfattribs are reduced to a layer and an ACI color. Entities aren't returned"""
+
+    def __init__(self, exporter) -> None:
+        super().__init__(exporter)
+        # R12 has no MESH entity
+        self._mesh_creation_methods_dic[FaceType.MESH.value] = self._create_mesh_polyface
+
+    @classmethod
+    def get_r12_attribs(cls, dxfattribs):
+        "Returns the layer and an ACI color (R12 doesn't support true colors)"
+        color = dxfattribs.get("color")
+        if color == 257:
+            true_color = dxfattribs.get("true_color")
+            color = 256 if true_color is None else get_nearest_aci(int2rgb(true_color))
+        return {"layer": dxfattribs.get("layer", "0"), "color": color}
+
+    def create_mesh_point(self, layout, position, dxfattribs=None, callback=None):
+        layout.add_point(position, **self.get_r12_attribs(dxfattribs or {}))
+
+    def _create_mesh_points(self, layout, mesh_arrays, dxfattribs, callback=None):
+        attribs = self.get_r12_attribs(dxfattribs)
+        for co in mesh_arrays.vertices.tolist():
+            layout.add_point(co, **attribs)
+
+    def _create_mesh_lines(self, layout, mesh_arrays, dxfattribs, callback=None):
+        attribs = self.get_r12_attribs(dxfattribs)
+        vertices = mesh_arrays.vertices
+        edges = self.get_lines_edges(mesh_arrays)
+        for start, end in zip(vertices[edges[:, 0]].tolist(), vertices[edges[:, 1]].tolist()):
+            layout.add_line(start, end, **attribs)
+
+    def _create_mesh_polylines(self, layout, mesh_arrays, dxfattribs, callback=None):
+        attribs = self.get_r12_attribs(dxfattribs)
+        vertices = mesh_arrays.vertices
+        for indices, closed in self.get_polylines(mesh_arrays):
+            layout.add_polyline(vertices[indices].tolist(), closed=closed, **attribs)
+
+    def _create_mesh_polyface(self, layout, mesh_arrays, dxfattribs, callback=None):
+        if mesh_arrays.polygons_count > 0:
+            if mesh_arrays.loop_totals.max() > 4:
+                mesh_arrays.triangulate()
+            layout.add_polyface(
+                mesh_arrays.vertices.tolist(),
+                [p.tolist() for p in mesh_arrays.polygons()],
+                **self.get_r12_attribs(dxfattribs),
+            )
+
+    def _create_mesh_3dfaces(self, layout, mesh_arrays, dxfattribs, callback=None):
+        if mesh_arrays.polygons_count == 0:
+            return
+        if mesh_arrays.loop_totals.max() > 4:
+            mesh_arrays.triangulate()
+        attribs = self.get_r12_attribs(dxfattribs)
+        for face in mesh_arrays.faces_co().tolist():
+            layout.add_3dface(face, **attribs)
@@ -0,0 +1,196 @@
+"""
+Bulk access to Blender mesh data through contiguous numpy arrays
+"""
+
+import numpy as np
+from ezdxf_exporter.core.shared_maths import get_co_array
+from ezdxf_exporter.data.transform.helper import transform_vertices
+
+
+def get_edges_vertices(mesh):
+    "Returns the edges vertex indices as a (E, 2) int array"
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    return edges.reshape(-1, 2)
+
+
+def get_loops_vertices(mesh):
+    "Returns the vertex index of every loop as a (L,) int array"
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loops)
+    return loops
+
+
+def get_loops_edges(mesh):
+    "Returns the edge index of every loop as a (L,) int array"
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loops)
+    return loops
+
+
+def get_polygons_loops(mesh):
+    "Returns the loop start and loop total of every polygon as two (P,) int arrays"
+    starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", starts)
+    mesh.polygons.foreach_get("loop_total", totals)
+    return starts, totals
+
+
+def get_loop_triangles_vertices(mesh):
+    "Returns the vertex indices of the mesh triangulation as a (T, 3) int array"
+    mesh.calc_loop_triangles()
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    return triangles.reshape(-1, 3)
+
+
+class MeshArrays:
+    """Vertex, edge and polygon buffers of a mesh, pulled with foreach_get the first time they are accessed.
+    Polygons are stored as a flat array of vertex indices (one per loop) with the loop start and loop total of each polygon
+    """
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self._vertices = None
+        self._edges = None
+        self._loop_vertices = None
+        self._loop_starts = None
+        self._loop_totals = None
+
+    @property
+    def vertices(self):
+        if self._vertices is None:
+            self._vertices = get_co_array(self.mesh.vertices)
+        return self._vertices
+
+    @property
+    def edges(self):
+        if self._edges is None:
+            self._edges = get_edges_vertices(self.mesh)
+        return self._edges
+
+    @property
+    def loop_vertices(self):
+        if self._loop_vertices is None:
+            self._loop_vertices = get_loops_vertices(self.mesh)
+        return self._loop_vertices
+
+    @property
+    def loop_starts(self):
+        if self._loop_starts is None:
+            self._loop_starts, self._loop_totals = get_polygons_loops(self.mesh)
+        return self._loop_starts
+
+    @property
+    def loop_totals(self):
+        if self._loop_totals is None:
+            self._loop_starts, self._loop_totals = get_polygons_loops(self.mesh)
+        return self._loop_totals
+
+    @property
+    def polygons_count(self):
+        return len(self.mesh.polygons) if self._loop_totals is None else len(self._loop_totals)
+
+    def transform(self, matrix):
+        "Transform the vertices coordinates. The Blender mesh is left untouched"
+        self._vertices = transform_vertices(self.vertices, matrix)
+
+    def polygons(self):
+        "Returns a list of vertex indices arrays, one per polygon"
+        return np.split(self.loop_vertices, self.loop_starts[1:])
+
+    def faces_co(self):
+        "Returns polygons of up to 4 vertices as a (F, 4, 3) coordinates array. Triangles repeat their last vertex"
+        # Loop index of the 4 corners of each polygon, clamped to the last loop of the polygon
+        corners = self.loop_starts[:, None] + np.minimum(np.arange(4), self.loop_totals[:, None] - 1)
+        return self.vertices[self.loop_vertices[corners]]
+
+    def loose_edges(self):
+        "Returns the edges that aren't part of a polygon as a (E, 2) int array"
+        if len(self.mesh.polygons) == 0:
+            return self.edges
+        # Read from the Blender mesh : the loops of the arrays may have been triangulated
+        is_loose = np.ones(len(self.edges), dtype=bool)
+        is_loose[get_loops_edges(self.mesh)] = False
+        return self.edges[is_loose]
+
+    def polygons_edges(self):
+        "Returns the edges of the polygons as a (L, 2) array of sorted vertex indices, one per loop"
+        next_loops = np.arange(1, len(self.loop_vertices) + 1)
+        # The loop after the last loop of a polygon is its first loop
+        next_loops[self.loop_starts + self.loop_totals - 1] = self.loop_starts
+        return np.sort(np.stack((self.loop_vertices, self.loop_vertices[next_loops]), axis=1), axis=1)
+
+    def triangulate(self):
+        "Replace the polygons with the mesh loop triangles. The Blender mesh is left untouched"
+        triangles = get_loop_triangles_vertices(self.mesh)
+        self._loop_vertices = triangles.ravel()
+        self._loop_starts = np.arange(0, len(self._loop_vertices), 3, dtype=np.int32)
+        self._loop_totals = np.full(len(triangles), 3, dtype=np.int32)
+
+
+# Vertex coordinates are rounded before comparing edge ends so float noise doesn't keep duplicates
+CLEAN_EDGES_DECIMALS = 6
+
+
+def get_clean_edges(vertices, edges, decimals=CLEAN_EDGES_DECIMALS):
+    """Returns the edges without zero-length ones and with a single edge for each pair of end points.
+    End points are compared by coordinates, so edges between overlapping vertices are duplicates too"""
+    if len(edges) == 0:
+        return edges
+    # Adding 0.0 turns -0.0 into 0.0 so both are the same point
+    _, first_index, inverse = np.unique(
+        np.round(vertices, decimals) + 0.0, axis=0, return_index=True, return_inverse=True
+    )
+    # Map every vertex to the first vertex at the same position, then sort the edge ends
+    ends = np.sort(first_index[inverse.ravel()][edges], axis=1)
+    ends = ends[ends[:, 0] != ends[:, 1]]
+    return np.unique(ends, axis=0)
+
+
+def get_boundary_edges(polygons_edges):
+    "Returns the edges used by a single polygon, given the (L, 2) sorted edges of all polygons"
+    edges, counts = np.unique(polygons_edges, axis=0, return_counts=True)
+    return edges[counts == 1]
+
+
+def chain_edges(edges):
+    """Returns the edges joined into the longest possible polylines, as (vertex indices, is closed) tuples.
+    Chains stop at vertices that aren't shared by exactly 2 edges. Chains ending where they start are closed"""
+    if len(edges) == 0:
+        return []
+    ends = edges.ravel()
+    counts = np.bincount(ends)
+    # Incident edges of every vertex, grouped by vertex
+    incident = (np.argsort(ends, kind="stable") // 2).tolist()
+    offsets = np.concatenate(((0,), np.cumsum(counts))).tolist()
+    degrees = counts.tolist()
+    edges_list = edges.tolist()
+    visited = [False] * len(edges_list)
+
+    def walk(vertex, edge):
+        chain = [vertex]
+        while not visited[edge]:
+            visited[edge] = True
+            v1, v2 = edges_list[edge]
+            vertex = v2 if v1 == vertex else v1
+            chain.append(vertex)
+            if degrees[vertex] != 2:
+                break
+            e1, e2 = incident[offsets[vertex] : offsets[vertex] + 2]
+            edge = e2 if e1 == edge else e1
+        if len(chain) > 2 and chain[0] == chain[-1]:
+            return chain[:-1], True
+        return chain, False
+
+    chains = []
+    # Open chains start at their ends, the edges left once they are walked are closed loops
+    for vertex in np.flatnonzero((counts != 2) & (counts > 0)).tolist():
+        for edge in incident[offsets[vertex] : offsets[vertex + 1]]:
+            if not visited[edge]:
+                chains.append(walk(vertex, edge))
+    for edge, (vertex, _) in enumerate(edges_list):
+        if not visited[edge]:
+            chains.append(walk(vertex, edge))
+    return chains
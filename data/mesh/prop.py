@@ -0,0 +1,25 @@
+import bpy
+from bpy.props import BoolProperty
+from .ui import draw
+
+
+class MeshSettings(bpy.types.PropertyGroup):
+    use_clean_lines: BoolProperty(
+        name="Clean Lines",
+        description="Skip zero-length edges and export a single line for edges sharing the same end points",
+        default=False,
+    )
+    use_join_edges: BoolProperty(
+        name="Join Edges",
+        description="Join connected edges that aren't part of a polygon into a single polyline",
+        default=False,
+    )
+    use_outlines: BoolProperty(
+        name="Outlines",
+        description="Export the borders of connected polygons as closed polylines instead of one polyline per polygon. "
+        "Closed meshes have no border",
+        default=False,
+    )
+
+    def draw(self, layout, lines_export):
+        draw(self, layout, lines_export)
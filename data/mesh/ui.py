@@ -0,0 +1,12 @@
+from .constants import LineType
+
+
+def draw(mesh_data, layout, lines_export):
+    box = layout.box()
+    box.label(text="Edge Options")
+    if lines_export == LineType.LINES.value:
+        box.prop(mesh_data, "use_clean_lines", toggle=True)
+    else:
+        row = box.row(align=True)
+        row.prop(mesh_data, "use_join_edges", toggle=True)
+        row.prop(mesh_data, "use_outlines", toggle=True)
@@ -17,7 +17,7 @@ class TextExporter(DataExporter):
         "MTEXT_BOTTOM_RIGHT": 9,
     }
 
-    def write_text(self, layout, text_obj, matrix, dxfattribs, callback):
+    def write_text(self, layout, text_obj, matrix, dxfattribs, callback=None):
         text = text_obj.data
         align_x, align_y = text.align_x, text.align_y
 
@@ -89,4 +89,5 @@ class TextExporter(DataExporter):
             text_dxf.set_pos((0, 0, 0), align=align_dxf)
         text_dxf.transform(ucs.matrix)
 
-        callback(text_dxf)
+        if callback is not None:
+            callback(text_dxf)
@@ -5,21 +5,37 @@ from ezdxf_exporter.data.transform.helper import get_ucs_matrix
 
 
 class TransformExporter(DataExporter):
+    def __init__(self, exporter) -> None:
+        super().__init__(exporter)
+        # UCS and export scale matrices, by frame
+        self._export_matrices = {}
+
     def get_matrix(self, obj: Object, is_block: bool = False) -> Matrix:
         if is_block:
             return Matrix()
         else:
-            settings = self.exporter.settings.transform
-            ucs_matrix = get_ucs_matrix(settings.ucs, self.exporter.context)
-            matrix = ucs_matrix @ obj.matrix_world
-            if settings.export_scale != (1, 1, 1):
-                mx = Matrix.Scale(settings.export_scale[0], 4, (1, 0, 0))
-                my = Matrix.Scale(settings.export_scale[1], 4, (0, 1, 0))
-                mz = Matrix.Scale(settings.export_scale[2], 4, (0, 0, 1))
-                matrix = mx @ my @ mz @ matrix
-            return matrix
+            return self.to_export_space(obj.matrix_world)
 
-    def get_rotation_axis_angle(self, obj: Object):
-        proxy_obj = obj.evaluated_get(self.exporter.context.evaluated_depsgraph_get())
-        proxy_obj.rotation_mode = "AXIS_ANGLE"
-        return proxy_obj.rotation_axis_angle
+    def to_export_space(self, matrix_world: Matrix) -> Matrix:
+        "Applies the UCS, the export scale and the delta translation to a world matrix"
+        return self.get_export_matrix() @ matrix_world
+
+    def get_export_matrix(self) -> Matrix:
+        """Returns the matrix applying the UCS, the export scale and the delta translation.
+        It is computed once per frame and shared by every exported object"""
+        frame = self.exporter.context.scene.frame_current
+        matrix = self._export_matrices.get(frame)
+        if matrix is not None:
+            return matrix
+        settings = self.exporter.settings.transform
+        matrix = get_ucs_matrix(settings.ucs, self.exporter.context)
+        if settings.export_scale != (1, 1, 1):
+            mx = Matrix.Scale(settings.export_scale[0], 4, (1, 0, 0))
+            my = Matrix.Scale(settings.export_scale[1], 4, (0, 1, 0))
+            mz = Matrix.Scale(settings.export_scale[2], 4, (0, 0, 1))
+            matrix = mx @ my @ mz @ matrix
+        if settings.delta_xyz != (0, 0, 0):
+            # Bake the translation once instead of translating every created entity
+            matrix = Matrix.Translation(settings.delta_xyz) @ matrix
+        self._export_matrices[frame] = matrix
+        return matrix
@@ -1,4 +1,5 @@
 from math import pi
+import numpy as np
 from mathutils import Matrix, Euler
 from ezdxf_exporter.data.transform.constants import UCS
 
@@ -27,6 +28,12 @@ def get_ucs_matrix(ucs_settings, context):
     return Matrix.Identity(4)
 
 
+def transform_vertices(co, matrix):
+    "Applies a 4x4 matrix to a (N, 3) coordinates array in a single matrix multiplication"
+    matrix = np.array(matrix, dtype=np.float64)
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+
 def update_export_scale(self, context):
     if not self.uniform_export_scale:
         return